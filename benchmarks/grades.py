@@ -0,0 +1,62 @@
+"""
+Vergelijk `SourceCijfers.parse_grades` met het oude pad per element
+(`validate_grades` via `Series.map`).
+
+    python -m benchmarks.grades [--rows N] [--repeat R]
+"""
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from report.specs.matching.cijfers import SourceCijfers
+
+
+SAMPLES = [
+    '7', '6', '8', '5,5', '7.5', '8,2', '65', '75', '101', '3', '10',
+    '9.9', 'abc', '', ' 7', None, 6, 7.5,
+]
+
+
+def genereer_cijfers(n, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.array(SAMPLES, dtype=object)
+    return pd.Series(values[rng.integers(len(values), size=n)], dtype=object)
+
+
+def per_element(s):
+    return pd.to_numeric(
+        s.map(SourceCijfers.validate_grades), errors='coerce').round()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.grades')
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    s = genereer_cijfers(args.rows)
+    no_comma = ~s.astype(str).str.contains(',')
+    pd.testing.assert_series_equal(
+        per_element(s[no_comma]),
+        SourceCijfers.parse_grades(s[no_comma]),
+        check_dtype=False,
+    )
+
+    timings = {
+        name: min(timeit.repeat(lambda: f(s), number=1, repeat=args.repeat))
+        for name, f in {
+            'validate_grades (map)': per_element,
+            'parse_grades': SourceCijfers.parse_grades,
+        }.items()
+    }
+    print(f"{args.rows:,} cijfers, beste van {args.repeat}:")
+    for name, t in timings.items():
+        print(f"  {name:<24} {t * 1000:>9.1f} ms")
+    old, new = timings.values()
+    print(f"  versnelling {old / new:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Vergelijk het geheugengebruik van de genormaliseerde formulieren met en
+zonder compacte representatie (zie `report.data.compacteer_forms`), per
+kolom, en controleer dat de grafieken en tabellen van een rapportage gelijk
+blijven.
+
+    python -m benchmarks.memory [EXPORT] [--forms N] [--taal nl] [--no-check]
+
+Zonder EXPORT wordt een synthetische export van N formulieren gebruikt (zie
+`benchmarks.synthetic`). Geheugen is `memory_usage(deep=True)`: een string
+telt per cel mee, ook als meerdere cellen hetzelfde object delen. Exitcode 1
+als een rapportage verschilt.
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.synthetic import genereer_export
+from report.core.chart import Chart
+from report.core.predicate import DATUM
+from report.data import (
+    compacteer_forms,
+    lees_export,
+    normaliseer_forms,
+    selecteer_forms,
+)
+from report.specs import transform_specs
+from report.specs.matching import load_specs
+
+
+def geheugen(df):
+    """Retourneer geheugengebruik (bytes) per kolom, inclusief objecten."""
+    return df.memory_usage(deep=True, index=False)
+
+
+def rapportage(forms, data, opleiding, taal):
+    data = selecteer_forms(forms, data, opleiding)
+    sections = transform_specs(load_specs(), data, taal)
+    return {
+        (key, item['item'].__name__): item['output']
+        for key, section in sections.items()
+        for item in section['items_']
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.memory')
+    parser.add_argument('export', nargs='?', help="pad naar export")
+    parser.add_argument('--forms', type=int, default=100_000)
+    parser.add_argument('--taal', default='nl')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--no-check', action='store_true',
+        help="vergelijk geen rapportages")
+    parser.add_argument(
+        '--client-transforms', action='store_true',
+        help="laat aggregatie van grafiekdata over aan de browser")
+    args = parser.parse_args(argv)
+
+    Chart.preaggregate = not args.client_transforms
+    export = (
+        genereer_export(args.forms, seed=args.seed) if args.export is None
+        else lees_export(args.export))
+    forms = normaliseer_forms(export)
+    del export
+    start = time.perf_counter()
+    compact = compacteer_forms(forms)
+    tijd = time.perf_counter() - start
+
+    voor, na = geheugen(forms), geheugen(compact)
+    mb = 2**20
+    print(f"{len(forms):,} rijen, {forms.ooa_id.nunique():,} formulieren")
+    print(f"\n  {'kolom':<16} {'object':>10} {'compact':>10}  dtype")
+    for col in forms.columns:
+        print(
+            f"  {col:<16} {voor[col] / mb:>8.1f}MB {na[col] / mb:>8.1f}MB"
+            f"  {forms[col].dtype} -> {compact[col].dtype}")
+    print(
+        f"  {'totaal':<16} {voor.sum() / mb:>8.1f}MB {na.sum() / mb:>8.1f}MB"
+        f"  {voor.sum() / na.sum():.1f}x kleiner, "
+        f"omzetten {tijd * 1000:.0f}ms")
+
+    if args.no_check:
+        return 0
+    is_datum = DATUM.mask(forms)
+    data = list(forms.antwoord[is_datum].dropna().unique()[:2])
+    opleiding = forms.opleiding.iloc[0]
+    verwacht = rapportage(forms, data, opleiding, args.taal)
+    gekregen = rapportage(compact, data, opleiding, args.taal)
+    fouten = [key for key in verwacht if verwacht[key] != gekregen.get(key)]
+    for key in fouten:
+        print(f"verschil   {key}")
+    print(
+        f"\nrapportage {opleiding} ({', '.join(data)}): "
+        f"{len(verwacht)} items vergeleken, {len(fouten)} verschillen")
+    return 1 if fouten else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Controleer dat PDEF en codings via de sidecar-cache (zie
+`report.core.getters.read_excel_cached`) gelijk zijn aan het workbook zelf,
+ook voor ontbrekende labels (lege cellen, 'n/a', 'NA'), en meet de leestijd.
+
+    python -m benchmarks.metadata [--pdef PAD] [--codings PAD]
+
+Exitcode 1 als een sheet verschilt.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from report.core import getters
+
+
+def workbook_met_nan(path):
+    """Schrijf codings-achtig workbook met ontbrekende Engelse labels."""
+    pd.DataFrame({
+        'code': ['JA', 'NEE', 'NVT', 'ONB'],
+        'ps': ['VOORBEELD'] * 4,
+        'type': ['A'] * 4,
+        'nl': ['ja', 'nee', 'n.v.t.', 'onbekend'],
+        'en': ['yes', 'no', 'n/a', None],
+    }).to_excel(path, index=False)
+    return path
+
+
+def vergelijk(path, sheet_name=0):
+    """
+    Retourneer melding als de sheet na een koude en een warme cache
+    verschilt van `read_excel`, anders None, en de leestijden.
+    """
+    verwacht = pd.read_excel(path, sheet_name=sheet_name)
+    tijden = []
+    for _ in range(2):
+        start = time.perf_counter()
+        gekregen = getters.read_excel_cached(path, sheet_name=sheet_name)
+        tijden.append(time.perf_counter() - start)
+        try:
+            pd.testing.assert_frame_equal(verwacht, gekregen)
+            # assert_frame_equal ziet None en NaN als gelijk; labels niet
+            pd.testing.assert_frame_equal(
+                verwacht.astype(str), gekregen.astype(str))
+        except AssertionError as e:
+            return str(e), tijden
+    return None, tijden
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.metadata')
+    parser.add_argument('--pdef', default=getters.PATHS['pdef'])
+    parser.add_argument('--codings', default=getters.PATHS['codings'])
+    args = parser.parse_args(argv)
+
+    fouten = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        getters.configure(cache=Path(tmp) / 'cache')
+        sheets = [
+            (workbook_met_nan(Path(tmp) / 'nan.xlsx'), 0),
+            (args.pdef, 0),
+            (args.pdef, 'antw'),
+            (args.codings, 0),
+        ]
+        for path, sheet in sheets:
+            if not Path(path).exists():
+                print(f"ontbreekt  {path}")
+                continue
+            melding, (koud, warm) = vergelijk(path, sheet)
+            status = 'verschil' if melding else 'gelijk'
+            print(
+                f"{status:<10} {Path(path).name} [{sheet}]: "
+                f"excel {koud * 1000:.0f}ms, cache {warm * 1000:.0f}ms")
+            if melding:
+                print(melding)
+                fouten += 1
+    return 1 if fouten else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Vergelijk de backends (zie `report.core.backend`) met pandas op een
+synthetische export: selecties, de tabel van elke grafiek, de cijfertabellen
+en de volledige grafiek-specs moeten gelijk zijn. Meet daarbij de tijd per
+backend. Met `--store` wordt de export ook in een tijdelijke DuckDB-database
+(zie `report.store`) geïmporteerd, als twee collegejaren, en wordt de
+selectie uit de database met de duckdb-backend vergeleken ('store'). Het
+eerste collegejaar heeft geen havodiploma's; de havo-cijfers over beide
+jaren moeten per backend dus gelijk zijn aan die van het tweede jaar.
+
+Een op de drie formulieren heeft een tweede matchingsdatum en de laatste
+opleiding heeft geen havodiploma's; ook van die opleiding worden de
+grafiek-specs vergeleken. De tabellen uit
+de `Cube` (en met `--store` uit `Store.cube`) moeten per selectie gelijk zijn
+aan die uit de geselecteerde formulieren.
+
+    python -m benchmarks.parity [--forms N] [--taal nl] [--store]
+
+Exitcode 1 als er een verschil is.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synthetic import MATCHINGSDATA, OPLEIDINGEN, genereer_export
+from report.core import backend
+from report.core.chart import Chart
+from report.core.cube import Cube
+from report.core.predicate import DATUM
+from report.data import normaliseer_forms, selecteer_forms_batch
+from report.specs import build_chart, transform_specs
+from report.specs.matching import load_specs
+from report.specs.matching.cijfers import HAVO, TabelHAVO
+
+
+@contextmanager
+def met_backend(name):
+    vorige = backend.BACKEND
+    backend.configure(name)
+    try:
+        yield
+    finally:
+        backend.configure(vorige)
+
+
+def tweede_datum(export):
+    """
+    Retourneer `export` met voor een op de drie formulieren een tweede
+    O_DATUM-rij, met de volgende matchingsdatum.
+    """
+    rows = export.loc[DATUM.mask(export) & (export.ooa_id % 3 == 0)]
+    volgende = dict(zip(MATCHINGSDATA, MATCHINGSDATA[1:] + MATCHINGSDATA[:1]))
+    rows = rows.assign(antwoord=rows.antwoord.map(volgende))
+    return (
+        pd.concat([export, rows], ignore_index=True)
+        .sort_values('ooa_id', kind='stable', ignore_index=True)
+    )
+
+
+def zonder_havo(export, opleiding=OPLEIDINGEN[-1]):
+    """Retourneer `export` zonder havodiploma's voor `opleiding`."""
+    havo = (
+        (export.opleiding == opleiding)
+        & (export.processtap == HAVO.vraag)
+        & export.antwoord.isin(HAVO.dip)
+    )
+    return export.loc[~havo].reset_index(drop=True)
+
+
+def selecties(export):
+    studentnummers = export.studentnummer.drop_duplicates().iloc[::7]
+    selecties = {
+        prog: (MATCHINGSDATA[:2], prog) for prog in OPLEIDINGEN
+    }
+    selecties['werkgroep'] = (
+        MATCHINGSDATA, OPLEIDINGEN[:2], list(studentnummers))
+    return selecties
+
+
+def resultaten(export, taal, selecteer=selecteer_forms_batch):
+    """
+    Retourneer resultaten en tijden per stap met de ingestelde backend, met
+    formulieren uit `selecteer(export, selecties)`.
+    """
+    out, tijden = {}, {}
+    start = time.perf_counter()
+    forms = selecteer(export, selecties(export))
+    tijden['selecteer_forms_batch'] = time.perf_counter() - start
+    for key, df in forms.items():
+        out[f'selectie {key}'] = (
+            df.drop(columns='collegejaar', errors='ignore')
+            .reset_index(drop=True))
+
+    data = forms[OPLEIDINGEN[0]]
+    start = time.perf_counter()
+    for section in load_specs().values():
+        for item in section['items']:
+            name = item['item'].__name__
+            if item['type'] == 'table':
+                out[f'tabel {name}'] = item['item'](data, taal)[1]
+            else:
+                chart = build_chart(item, data, taal)
+                out[f'table {name}'] = chart.source.table
+    tijden['tabellen'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sections = transform_specs(load_specs(), data.copy(), taal)
+    tijden['transform_specs'] = time.perf_counter() - start
+    for section in sections.values():
+        for item in section['items_']:
+            out[f"output {item['item'].__name__}"] = item['output']
+
+    sections = transform_specs(load_specs(), forms[OPLEIDINGEN[-1]], taal)
+    for section in sections.values():
+        for item in section['items_']:
+            naam = item['item'].__name__
+            out[f"output {OPLEIDINGEN[-1]} {naam}"] = item['output']
+    return out, tijden
+
+
+def kubus(export, taal, cube, selecteer=selecteer_forms_batch):
+    """
+    Retourneer per selectie en grafiek de tabel uit de geselecteerde
+    formulieren en die uit `cube`, met de ingestelde backend.
+    """
+    out = {}
+    for key, df in selecteer(export, selecties(export)).items():
+        data, progs, *studentnummers = selecties(export)[key]
+        werkgroep = key if studentnummers else None
+        uit_cube = cube.select(data, progs, werkgroep).attach(df.copy())
+        for section in load_specs().values():
+            for item in section['items']:
+                if item['type'] != 'table':
+                    out[f"{key} {item['item'].__name__}"] = tuple(
+                        build_chart(item, frame, taal).source.table
+                        for frame in (df, uit_cube))
+    return out
+
+
+def uit_store(path):
+    """
+    Retourneer functie die selecteert uit de export in database `path`,
+    zoals `selecteer_forms_batch`.
+    """
+    from report.store import Store
+
+    def selecteer(export, selecties):
+        with Store(path, read_only=True) as store:
+            return store.selecteer_forms_batch(selecties, '2022-2023')
+    return selecteer
+
+
+def importeer(export, path):
+    from report.store import Store
+
+    with Store(path) as store:
+        store.importeer_export(
+            export.loc[export.processtap != HAVO.vraag], '2021-2022')
+        store.importeer_export(export, '2022-2023')
+
+
+def meerdere_jaren(path, taal):
+    """
+    Retourneer per backend de havo-cijfers van beide collegejaren samen en
+    van alleen 2022-2023 uit de database `path`.
+    """
+    from report.store import Store
+
+    selectie = {'prog': (MATCHINGSDATA[:2], OPLEIDINGEN[0])}
+    out = {}
+    for name in backend.BACKENDS:
+        with met_backend(name), Store(path, read_only=True) as store:
+            out[name] = [
+                TabelHAVO(
+                    store.selecteer_forms_batch(selectie, jaren)['prog'],
+                    taal)[1]
+                for jaren in (['2021-2022', '2022-2023'], '2022-2023')
+            ]
+    return out
+
+
+def verschil(a, b):
+    if isinstance(a, pd.DataFrame) and isinstance(b, pd.DataFrame):
+        try:
+            # de database slaat ids op als nullable integers
+            pd.testing.assert_frame_equal(a, b, check_dtype=False)
+        except AssertionError as e:
+            return str(e)
+        return None
+    return None if a == b else f"{a!r:.60} != {b!r:.60}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.parity')
+    parser.add_argument('--forms', type=int, default=10_000)
+    parser.add_argument('--taal', default='nl')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--backends', nargs='+', default=['polars', 'duckdb'],
+        choices=[b for b in backend.BACKENDS if b != 'pandas'])
+    parser.add_argument(
+        '--store', action='store_true',
+        help="vergelijk ook selectie uit een DuckDB-database")
+    parser.add_argument(
+        '--client-transforms', action='store_true',
+        help="laat aggregatie van grafiekdata over aan de browser")
+    args = parser.parse_args(argv)
+
+    Chart.preaggregate = not args.client_transforms
+    export = zonder_havo(tweede_datum(
+        normaliseer_forms(genereer_export(args.forms, seed=args.seed))))
+    werkgroepen = {'werkgroep': selecties(export)['werkgroep'][2]}
+    with met_backend('pandas'):
+        verwacht, tijden = resultaten(export, args.taal)
+        kubussen = kubus(export, args.taal, Cube(export, werkgroepen))
+    tijden = {'pandas': tijden}
+    gekregen = {}
+    for name in args.backends:
+        with met_backend(name):
+            gekregen[name], tijden[name] = resultaten(export, args.taal)
+    if args.store:
+        with tempfile.TemporaryDirectory() as tmp, met_backend('duckdb'):
+            path = Path(tmp) / 'ooa.duckdb'
+            importeer(export, path)
+            gekregen['store'], tijden['store'] = resultaten(
+                export, args.taal, uit_store(path))
+            jaren = meerdere_jaren(path, args.taal)
+            from report.store import Store
+
+            with Store(path, read_only=True) as store:
+                cube = store.cube('2022-2023', OPLEIDINGEN, werkgroepen)
+            kubussen.update({
+                f'store {key}': tabellen
+                for key, tabellen in kubus(
+                    export, args.taal, cube, uit_store(path)).items()
+            })
+
+    fouten = 0
+    for name, resultaat in gekregen.items():
+        for key in sorted(verwacht.keys() | resultaat.keys()):
+            if key not in verwacht or key not in resultaat:
+                print(f"ontbreekt  {name}: {key}")
+                fouten += 1
+                continue
+            melding = verschil(verwacht[key], resultaat[key])
+            if melding is not None:
+                print(f"verschil   {name}: {key}\n{melding}\n")
+                fouten += 1
+    for key, (formulieren, cube) in kubussen.items():
+        melding = verschil(formulieren, cube)
+        if melding is not None:
+            print(f"verschil   {key}: formulieren en cube\n{melding}\n")
+            fouten += 1
+    for name, (beide, laatste) in (jaren.items() if args.store else ()):
+        melding = verschil(laatste, beide)
+        if melding is not None:
+            print(f"verschil   {name}: havo-cijfers over twee jaren\n{melding}\n")
+            fouten += 1
+    print(
+        f"{len(verwacht)} resultaten vergeleken met "
+        f"{', '.join(gekregen)} en {len(kubussen)} met cube: "
+        f"{fouten} verschillen")
+
+    print(
+        f"\n{args.forms:,} formulieren{'':<14} "
+        + ' '.join(f"{name:>10}" for name in tijden))
+    for key in tijden['pandas']:
+        print(f"  {key:<30} " + ' '.join(
+            f"{t[key] * 1000:>8.1f}ms" for t in tijden.values()))
+    return 1 if fouten else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Meet de stappen van het genereren van een rapportage op synthetische exports
+van oplopende omvang (zie `benchmarks.synthetic`) en vergelijk met een
+opgeslagen baseline.
+
+    python -m benchmarks.pipeline [--sizes 1000 10000 ...] [--save]
+
+Per omvang worden gemeten: `normaliseer_forms`, `selecteer_forms`,
+`Source.table` en `Chart.chart()` per grafiek, de tabellen, en
+`transform_specs` plus `render_report` voor een hele rapportage. Tabellen en
+grafieken worden gemeten met de gedeelde indexen van de rapportage al
+opgebouwd, zoals voor alle items behalve het eerste, maar zonder de tabellen
+die bronnen uit `Source.of` delen (zie `zonder_bronnen`); de hele rapportage
+wordt steeds op een nieuwe kopie van de formulieren gemeten.
+
+Met `--save` worden de resultaten de nieuwe baseline; anders wordt elke meting
+vergeleken met de baseline en is de exitcode 1 als een stap meer dan
+`--tolerance` keer zo traag is.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import report.core.getters as getters
+from benchmarks.synthetic import MATCHINGSDATA, OPLEIDINGEN, genereer_export
+from report.core.chart import Chart
+from report.core.source import Partition
+from report.data import normaliseer_forms, selecteer_forms
+from report.render import render_report
+from report.specs import build_chart, transform_specs
+from report.specs.matching import load_specs
+
+
+BASELINE = Path(__file__).parent / 'baseline.json'
+SIZES = [1_000, 10_000, 100_000]
+
+
+def beste(func, setup=None, repeat=3):
+    """
+    Retourneer kortste tijd van `repeat` keer `func`, met het resultaat van
+    `setup` (niet gemeten) als argument.
+    """
+    tijden = []
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        func(*args)
+        tijden.append(time.perf_counter() - start)
+    return min(tijden)
+
+
+def zonder_bronnen(data):
+    """
+    Verwijder de door `Source.of` gedeelde waarden van `data`, zodat een
+    tabel opnieuw berekend wordt in plaats van uit een eerder item te komen.
+    """
+    derived = Partition.of(data).derived
+    for key in [key for key in derived if key[0] == 'source']:
+        del derived[key]
+
+
+def meet(n, taal='nl', repeat=3, seed=0):
+    """Retourneer tijden (s) per stap voor een export van `n` formulieren."""
+    export = genereer_export(n, seed=seed)
+    matchingsdata, opleiding = MATCHINGSDATA[:2], OPLEIDINGEN[0]
+    tijden = {}
+    tijden['normaliseer_forms'] = beste(
+        normaliseer_forms, lambda: export, repeat)
+    forms = normaliseer_forms(export)
+    tijden['selecteer_forms'] = beste(
+        lambda df: selecteer_forms(df, matchingsdata, opleiding),
+        lambda: forms, repeat)
+    data = selecteer_forms(forms, matchingsdata, opleiding)
+
+    for section in load_specs().values():
+        for item in section['items']:
+            name = item['item'].__name__
+            if item['type'] == 'table':
+                tijden[f'tabel {name}'] = beste(
+                    lambda _: item['item'](data, taal),
+                    lambda: zonder_bronnen(data), repeat)
+                continue
+
+            def build(table=False):
+                zonder_bronnen(data)
+                obj = build_chart(item, data, taal)
+                if table:
+                    obj.source.table
+                return obj
+
+            tijden[f'table {name}'] = beste(
+                lambda obj: obj.source.table, build, repeat)
+            tijden[f'chart {name}'] = beste(
+                lambda obj: obj.chart(), lambda: build(table=True), repeat)
+
+    def rapportage(data):
+        sections = transform_specs(load_specs(), data, taal)
+        render_report(sections, taal, opleiding)
+
+    tijden['transform_specs + render'] = beste(
+        rapportage, lambda: data.copy(), repeat)
+    return tijden
+
+
+def lees_baseline(path=BASELINE):
+    try:
+        return json.loads(Path(path).read_text(encoding='utf8'))
+    except (OSError, ValueError):
+        return {'sizes': {}}
+
+
+def schrijf_baseline(resultaten, path=BASELINE):
+    baseline = lees_baseline(path)
+    baseline['omgeving'] = {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+    for n, tijden in resultaten.items():
+        baseline['sizes'][str(n)] = tijden
+    Path(path).write_text(
+        json.dumps(baseline, indent=1, sort_keys=True) + '\n',
+        encoding='utf8')
+
+
+def vergelijk(n, tijden, baseline, tolerance, file=sys.stdout):
+    """
+    Print tijden naast de baseline voor `n` formulieren; retourneer de
+    stappen die meer dan `tolerance` keer zo traag zijn.
+    """
+    basis = baseline['sizes'].get(str(n), {})
+    traag = []
+    print(f"\n{n:,} formulieren", file=file)
+    for name, t in tijden.items():
+        regel = f"  {name:<40} {t * 1000:>10.1f} ms"
+        if name in basis:
+            ratio = t / basis[name]
+            regel += f"  {basis[name] * 1000:>10.1f} ms  {ratio:>5.2f}x"
+            if ratio > tolerance:
+                regel += '  !'
+                traag.append(name)
+        print(regel, file=file)
+    return traag
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.pipeline')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--taal', default='nl')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument(
+        '--save', action='store_true', help="sla resultaten op als baseline")
+    parser.add_argument(
+        '--client-transforms', action='store_true',
+        help="laat aggregatie van grafiekdata over aan de browser")
+    parser.add_argument('--pdef')
+    parser.add_argument('--codings')
+    args = parser.parse_args(argv)
+
+    getters.configure(args.pdef, args.codings)
+    Chart.preaggregate = not args.client_transforms
+    baseline = lees_baseline(args.baseline)
+    resultaten, traag = {}, []
+    for n in args.sizes:
+        resultaten[n] = meet(n, args.taal, args.repeat)
+        traag += [
+            f"{n}: {name}" for name in
+            vergelijk(n, resultaten[n], baseline, args.tolerance)]
+
+    if args.save:
+        schrijf_baseline(resultaten, args.baseline)
+        print(f"\nbaseline opgeslagen in {args.baseline}")
+        return 0
+    if traag:
+        print(f"\ntrager dan {args.tolerance}x de baseline:")
+        print('\n'.join(f"  {i}" for i in traag))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Genereer een synthetische OOA export uit de processtappen en antwoordcodes in
+PDEF en codings, om zonder studentgegevens te kunnen meten.
+
+    python -m benchmarks.synthetic N OUT [--opleidingen ...] [--seed S]
+
+`OUT` is een csv-, pkl- of parquet-bestand. Per formulier worden gemaakt:
+
+- O_DATUM: een van de matchingsdata (systeem_antwoord_code)
+- processtappen met antwoordcodes in PDEF (gesloten_antwoord_code), behalve
+  meerkeuzevragen (zie `SourceMultiSelect`): een of meer opties met '|'
+  gescheiden (open_antwoord_student)
+- processtappen met een systeemlijst uit `ANTWOORDCODES`: codes uit codings
+- cijfers ([OU]_CIJF_...): cijfers als tekst, met komma's, punten, honderdtallen
+  en ongeldige waarden (open_antwoord_student)
+- vragen uit codings (type Q) die zelf een processtap zijn: antwoordcodes uit
+  codings (type A) van de groep of uit `ANTWOORDCODES`, anders uren als tekst
+
+Elke vraag (behalve O_DATUM) wordt met kans `respons` beantwoord.
+"""
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+
+from report.core.getters import load_pdef, load_specifications
+from report.data import ANTWOORD_COLS
+from report.specs.matching.studiekeuze import SourceMultiSelect
+
+
+MATCHINGSDATA = ['2023-04-01', '2023-05-01', '2023-06-01']
+OPLEIDINGEN = ['B GEO', 'B BIO', 'B LIT', 'B NAT', 'B PSY']
+ANTWOORDCODES = {
+    'AANM_5PUNTS': 'STELLING_EENS',
+    'AANM_5PUNTS_B': 'STELLING_PAST',
+    'U_STEL_CONSC': 'STELLING_EENS',
+}
+CIJFERS = re.compile(r'[OU]_CIJF_(?!TOEL.*$).*')
+ROMMEL = ['abc', '', ' 7', '101', '3', '65', '75', '-']
+UREN = ['0', '1.5', '3', '7,5', '12', '18', '22', '28', '40', 'veel', '']
+
+
+def vragenlijst():
+    """
+    Retourneer per processtap in de export de soort antwoord en de
+    mogelijke antwoordcodes, afgeleid uit PDEF en codings.
+    """
+    pdef, codings = load_pdef(), load_specifications()
+    antw = pdef['antw'].groupby('processtap', sort=False).antwoord_code
+    antw = {ps: list(codes) for ps, codes in antw}
+    groepen = {
+        key: list(group.index)
+        for key, group in codings.groupby(['type', 'ps'], sort=False)
+    }
+    meerkeuze = {
+        ps for cls in SourceMultiSelect.__subclasses__()
+        for ps in cls.processtappen
+    }
+
+    vragen = {'O_DATUM': ('datum', MATCHINGSDATA)}
+    for ps, lijst in zip(pdef['ps'].processtap, pdef['ps'].systeemlijst_io):
+        if ps in vragen:
+            continue
+        if ps in meerkeuze:
+            codes = antw.get(ps) or groepen.get(('Q', ps))
+            vragen[ps] = ('meerkeuze', codes)
+        elif ps in antw:
+            vragen[ps] = ('gesloten', antw[ps])
+        elif lijst in ANTWOORDCODES:
+            vragen[ps] = ('gesloten', groepen[('A', ANTWOORDCODES[lijst])])
+        elif CIJFERS.fullmatch(ps):
+            vragen[ps] = ('cijfer', None)
+    for (type_, ps), codes in groepen.items():
+        if type_ != 'Q' or ps in meerkeuze:
+            continue
+        antwoorden = (
+            groepen.get(('A', ANTWOORDCODES.get(ps, ps)))
+            or groepen.get(('A', ps))
+        )
+        for code in codes:
+            vragen[code] = (
+                ('gesloten', antwoorden) if antwoorden else ('uren', UREN))
+    return vragen
+
+
+def _cijfers(rng, n):
+    cijfers = np.round(rng.normal(6.8, 1.1, n).clip(1, 10), 1)
+    cijfers = np.where(
+        cijfers % 1 == 0,
+        cijfers.astype(int).astype(str),
+        cijfers.astype(str),
+    )
+    komma = rng.random(n) < .3
+    cijfers[komma] = np.char.replace(cijfers[komma], '.', ',')
+    cijfers = cijfers.astype(object)
+    rommel = rng.random(n) < .05
+    cijfers[rommel] = rng.choice(ROMMEL, rommel.sum())
+    return cijfers
+
+
+def _meerkeuze(rng, n, codes):
+    keuze = rng.random((n, len(codes))) < .4
+    keuze[~keuze.any(axis=1), 0] = True
+    bits = keuze @ (1 << np.arange(len(codes)))
+    combinaties = {
+        i: '|'.join(c for j, c in enumerate(codes) if i >> j & 1)
+        for i in np.unique(bits)
+    }
+    return np.array([combinaties[i] for i in bits], dtype=object)
+
+
+def genereer_export(
+    n,
+    opleidingen=OPLEIDINGEN,
+    matchingsdata=MATCHINGSDATA,
+    respons=.95,
+    seed=0,
+):
+    """
+    Retourneer synthetische OOA export met `n` formulieren, verdeeld over
+    `opleidingen` en `matchingsdata`, in de kolommen van de ruwe export.
+    Antwoordcodes worden per vraag met een willekeurige (vaste) verdeling
+    getrokken.
+    """
+    rng = np.random.default_rng(seed)
+    ooa_id = np.arange(1, n + 1)
+    opleiding = np.array(opleidingen, dtype=object)[
+        rng.integers(len(opleidingen), size=n)]
+
+    frames = []
+    for ps, (soort, codes) in vragenlijst().items():
+        if soort == 'datum':
+            rows = np.arange(n)
+            codes = matchingsdata
+        else:
+            rows = np.flatnonzero(rng.random(n) < respons)
+        m = len(rows)
+        antwoord = {col: None for col in ANTWOORD_COLS}
+        if soort == 'datum':
+            antwoord['systeem_antwoord_code'] = rng.choice(
+                np.array(codes, dtype=object), m)
+        elif soort == 'gesloten':
+            antwoord['gesloten_antwoord_code'] = rng.choice(
+                np.array(codes, dtype=object), m,
+                p=rng.dirichlet(np.ones(len(codes))))
+        elif soort == 'meerkeuze':
+            antwoord['open_antwoord_student'] = _meerkeuze(rng, m, codes)
+        elif soort == 'cijfer':
+            antwoord['open_antwoord_student'] = _cijfers(rng, m)
+        elif soort == 'uren':
+            antwoord['open_antwoord_student'] = rng.choice(
+                np.array(codes, dtype=object), m)
+        frames.append(pd.DataFrame({
+            'ooa_id': ooa_id[rows],
+            'studentnummer': 1_000_000 + ooa_id[rows],
+            'opleiding': opleiding[rows],
+            'processtap': ps,
+            **antwoord,
+        }))
+    return (
+        pd.concat(frames, ignore_index=True)
+        .astype({col: object for col in ANTWOORD_COLS})
+        .sort_values('ooa_id', kind='stable', ignore_index=True)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.synthetic',
+        description="Genereer een synthetische OOA export.")
+    parser.add_argument('n', type=int, help="aantal formulieren")
+    parser.add_argument('out', help="csv-, pkl- of parquet-bestand")
+    parser.add_argument('--opleidingen', nargs='+', default=OPLEIDINGEN)
+    parser.add_argument('--matchingsdata', nargs='+', default=MATCHINGSDATA)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    df = genereer_export(
+        args.n, args.opleidingen, args.matchingsdata, seed=args.seed)
+    suffix = args.out.rsplit('.', 1)[-1].lower()
+    if suffix == 'csv':
+        df.to_csv(args.out, index=False)
+    elif suffix == 'parquet':
+        df.to_parquet(args.out, index=False)
+    else:
+        df.to_pickle(args.out)
+    print(f"{len(df):,} rijen, {args.n:,} formulieren -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
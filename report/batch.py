@@ -0,0 +1,467 @@
+"""
+Genereer rapportages in batch over opleidingen, talen en werkgroepen.
+
+    python -m report.batch manifest.json [--workers N] [--output DIR]
+
+Het manifest is een json-bestand:
+
+    {
+        "export": "data/ooa_export.xlsx",
+        "collegejaar": "2022-2023",
+        "pdef": "data/ooa.ba2223.matching.pdef.xlsx",
+        "codings": "data/codings.xlsx",
+        "rapportages": [
+            {
+                "opleiding": "B GEO",
+                "matchingsdata": ["2023-04-01", "2023-05-01"],
+                "talen": ["nl", "en"],
+                "werkgroepen": {"A": [1234567, 2345678]}
+            }
+        ]
+    }
+
+Per opleiding wordt een rapportage gemaakt voor alle formulieren en een per
+werkgroep; `pdef`, `codings`, `talen` en `werkgroepen` zijn optioneel.
+Zonder `pdef` of `codings` worden bij een DuckDB-database (zie hieronder) de
+daarin geïmporteerde PDEF en codings van (het laatste) `collegejaar`
+gebruikt.
+`export` kan ook een met `python -m report.data` geïmporteerde parquet
+dataset zijn (bijv. "data/store/collegejaar=2022-2023"), of een met
+`python -m report.store` gevulde DuckDB-database (bijv. "data/ooa.duckdb");
+dan worden alleen de formulieren van `collegejaar` (een collegejaar of een
+lijst) geselecteerd en de aantallen voor de `Cube` in de database berekend.
+
+Per rapportage wordt in `output/.rapportages.json` een hash van de invoer
+bijgehouden; rapportages waarvan formulieren, specs, template en metadata
+sinds de vorige run gelijk zijn gebleven, worden overgeslagen (`--force`
+genereert alles opnieuw).
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import report.core.getters as getters
+from report.cache import (
+    PATH as CACHE_PATH,
+    ChartCache,
+    code_version,
+    hash_files,
+)
+from report.core.backend import BACKENDS, configure as configure_backend
+from report.core.chart import Chart
+from report.core.cube import Cube
+from report.data import (
+    fingerprint,
+    lees_export,
+    normaliseer_forms,
+    selecteer_forms_batch,
+)
+from report.render import TEMPLATES, stream_report
+from report.specs import transform_specs
+from report.specs.matching import load_specs
+from report.trace import NULL, Trace
+
+
+RUN_MANIFEST = '.rapportages.json'
+
+
+def lees_manifest(path):
+    with open(path, encoding='utf8') as f:
+        return json.load(f)
+
+
+def plan_rapportages(manifest):
+    """
+    Retourneer selecties voor `selecteer_forms_batch` en de rapportages
+    (opleiding x taal x werkgroep) die daaruit gegenereerd worden. Twee
+    rapportages met dezelfde `bestandsnaam` (bijvoorbeeld een opleiding
+    tweemaal met andere matchingsdata) geven een ValueError.
+    """
+    selecties, jobs, namen = {}, [], {}
+    for i, rapportage in enumerate(manifest['rapportages']):
+        werkgroepen = {None: None, **rapportage.get('werkgroepen', {})}
+        for werkgroep, studentnummers in werkgroepen.items():
+            key = (i, werkgroep)
+            selecties[key] = (
+                rapportage['matchingsdata'],
+                rapportage['opleiding'],
+                studentnummers,
+            )
+            for taal in rapportage.get('talen', ['nl']):
+                job = {
+                    'key': key,
+                    'opleiding': rapportage['opleiding'],
+                    'matchingsdata': rapportage['matchingsdata'],
+                    'werkgroep': werkgroep,
+                    'taal': taal,
+                    'collegejaar': manifest.get('collegejaar'),
+                }
+                naam = bestandsnaam(job)
+                if naam in namen:
+                    raise ValueError(
+                        f"rapportages {namen[naam]} en {i} in manifest "
+                        f"schrijven beide naar {naam}")
+                namen[naam] = i
+                jobs.append(job)
+    return selecties, jobs
+
+
+def versies(paths=None):
+    """
+    Retourneer versies (hashes) van de code van de specs, de template en de
+    metadata waarmee rapportages gegenereerd worden.
+    """
+    paths = {**getters.PATHS, **(paths or {})}
+    return {
+        'specs': code_version(),
+        'template': hash_files(Path(TEMPLATES).glob('*')),
+        'metadata': hash_files([paths['pdef'], paths['codings']]),
+    }
+
+
+def input_hash(job, fingerprint, versies, preaggregate):
+    """
+    Retourneer hash van alles waar de rapportage voor `job` van afhangt:
+    de geselecteerde formulieren en hun antwoorden (`fingerprint`), de
+    parameters van de rapportage en de versies van specs en template.
+    """
+    key = json.dumps(
+        [
+            fingerprint,
+            {k: v for k, v in job.items() if k != 'key'},
+            versies,
+            preaggregate,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def lees_run_manifest(output):
+    try:
+        with open(Path(output) / RUN_MANIFEST, encoding='utf8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def schrijf_run_manifest(output, entries):
+    path = Path(output) / RUN_MANIFEST
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf8') as f:
+        json.dump(entries, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def bestandsnaam(job):
+    parts = [job['opleiding'], job['werkgroep'], job['taal']]
+    name = '.'.join(str(part) for part in parts if part is not None)
+    return re.sub(r'[^\w.-]+', '_', name) + '.html'
+
+
+def genereer_rapportage(data, job, output, cache=None, trace=None):
+    """
+    Genereer rapportage voor `job` uit geselecteerde formulieren `data` en
+    schrijf deze naar `output`. Retourneert pad van de rapportage en de
+    items die niet gebouwd konden worden (`fouten` per sectie, zie
+    `transform_specs`) als lijst van dicts met sectie, item en foutmelding.
+    """
+    sections = transform_specs(
+        load_specs(), data, job['taal'], cache=cache, trace=trace)
+    path = Path(output) / bestandsnaam(job)
+    with (trace or NULL).span('render', 'render') as t:
+        stream_report(
+            path,
+            sections,
+            taal=job['taal'],
+            opleiding=job['opleiding'],
+            werkgroep=job['werkgroep'],
+            collegejaar=job['collegejaar'],
+            matchingsdata=job['matchingsdata'],
+            nformulier=data.ooa_id.nunique(),
+        )
+        t['bytes'] = path.stat().st_size
+    fouten = [
+        {'sectie': key, **fout}
+        for key, section in sections.items()
+        for fout in section.get('fouten', [])
+    ]
+    return path, fouten
+
+
+def _cube_key(key):
+    return ':'.join(str(i) for i in key)
+
+
+_cache = None
+_trace = None
+
+
+def _run(data, job, output, cube=None):
+    start = time.perf_counter()
+    if cube is not None:
+        cube.attach(data)
+    stats = (_cache.hits, _cache.misses) if _cache is not None else (0, 0)
+    result = {
+        **job, 'status': 'ok', 'path': None, 'error': None, 'fouten': []}
+    trace = None if _trace is None else Trace(memory=_trace['memory'])
+    try:
+        if data.empty:
+            result['status'] = 'leeg'
+        else:
+            path, result['fouten'] = genereer_rapportage(
+                data, job, output, cache=_cache, trace=trace)
+            result['path'] = str(path)
+    except Exception as e:
+        result['status'] = 'fout'
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    finally:
+        if trace is not None:
+            trace.close()
+            if trace.events:
+                naam = bestandsnaam(job).removesuffix('.html')
+                trace.to_csv(Path(_trace['path']) / f"{naam}.csv")
+                trace.to_chrome(Path(_trace['path']) / f"{naam}.json")
+    if _cache is not None:
+        result['hits'] = _cache.hits - stats[0]
+        result['misses'] = _cache.misses - stats[1]
+    result['tijd'] = time.perf_counter() - start
+    return result
+
+
+def _init_worker(
+    pdef, codings, preaggregate, cache, trace=None, backend='pandas'):
+    global _cache, _trace
+    getters.configure(pdef, codings)
+    configure_backend(backend)
+    Chart.preaggregate = preaggregate
+    _cache = None if cache is None else ChartCache(cache)
+    _trace = trace
+
+
+def run(
+    manifest,
+    output='output',
+    workers=None,
+    preaggregate=True,
+    cache=CACHE_PATH,
+    force=False,
+    trace=None,
+    trace_memory=False,
+    backend='pandas',
+    compact=False,
+):
+    """
+    Genereer alle rapportages uit `manifest` parallel over `workers`
+    processen (standaard alle cores). Met `preaggregate` worden de
+    grafiekdata vooraf in pandas geaggregeerd, zie `Chart`; grafieken worden
+    hergebruikt uit de `ChartCache` in map `cache` (`None` voor geen cache).
+    Rapportages waarvan de invoer sinds de vorige run niet veranderd is,
+    worden overgeslagen, tenzij `force`. Met `trace` wordt per rapportage
+    een `Trace` (csv en Chrome trace json) in die map geschreven, met
+    `trace_memory` inclusief piekgeheugen. `backend` is de rekenbackend voor
+    selectie en tabellen (zie `report.core.backend`). Met `compact` wordt de
+    export compact in het geheugen gehouden (zie `compacteer_forms`).
+    Retourneert resultaat per rapportage.
+    """
+    paths = {k: manifest[k] for k in ('pdef', 'codings') if k in manifest}
+    getters.configure(**paths)
+    configure_backend(backend)
+    Path(output).mkdir(parents=True, exist_ok=True)
+    if trace is not None:
+        Path(trace).mkdir(parents=True, exist_ok=True)
+        trace = {'path': str(trace), 'memory': trace_memory}
+
+    selecties, jobs = plan_rapportages(manifest)
+    werkgroepen = {
+        _cube_key(key): studentnummers
+        for key, (_, _, studentnummers) in selecties.items()
+        if studentnummers is not None
+    }
+    if str(manifest['export']).endswith('.duckdb'):
+        from report.store import Store
+
+        progs = sorted({r['opleiding'] for r in manifest['rapportages']})
+        with Store(manifest['export'], read_only=True) as store:
+            if not {'pdef', 'codings'} <= paths.keys():
+                collegejaar = manifest['collegejaar']
+                collegejaar = (
+                    collegejaar[-1] if isinstance(collegejaar, list)
+                    else collegejaar)
+                paths = {
+                    **store.exporteer_metadata(
+                        collegejaar, Path(getters.PATHS['cache']) / 'store'),
+                    **paths,
+                }
+                getters.configure(**paths)
+            forms = store.selecteer_forms_batch(
+                selecties, manifest['collegejaar'])
+            cube = store.cube(manifest['collegejaar'], progs, werkgroepen)
+    else:
+        export = normaliseer_forms(
+            lees_export(manifest['export']), compact=compact)
+        forms = selecteer_forms_batch(export, selecties)
+        cube = Cube(export, werkgroepen=werkgroepen)
+    slices = {
+        key: cube.select(
+            data, progs, None if studentnummers is None else _cube_key(key))
+        for key, (data, progs, studentnummers) in selecties.items()
+    }
+
+    fingerprints = {key: fingerprint(data) for key, data in forms.items()}
+    vorige = {} if force else lees_run_manifest(output)
+    huidige = versies(paths)
+    entries, results, todo = {}, [], []
+    for job in jobs:
+        naam = bestandsnaam(job)
+        entries[naam] = input_hash(
+            job, fingerprints[job['key']], huidige, preaggregate)
+        if (vorige.get(naam) == entries[naam]
+                and (Path(output) / naam).exists()):
+            results.append({
+                **job, 'status': 'actueel', 'tijd': 0.0,
+                'path': str(Path(output) / naam), 'error': None})
+        else:
+            todo.append(job)
+
+    # polars en duckdb starten bij gebruik threads die een fork niet overleven
+    context = 'spawn' if backend != 'pandas' else None
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(context),
+        initializer=_init_worker,
+        initargs=(
+            paths.get('pdef'), paths.get('codings'), preaggregate, cache,
+            trace, backend),
+    ) as pool:
+        futures = [
+            pool.submit(
+                _run, forms[job['key']], job, output, slices[job['key']])
+            for job in todo
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    # ook met weggelaten items opnieuw proberen bij de volgende run
+    failed = {
+        bestandsnaam(r) for r in results
+        if r['status'] == 'fout' or r.get('fouten')
+    }
+    schrijf_run_manifest(output, {
+        naam: entry for naam, entry in entries.items()
+        if naam not in failed
+    })
+    return results
+
+
+def _naam(result):
+    return ' '.join(
+        str(result[k]) for k in ('opleiding', 'werkgroep', 'taal')
+        if result[k] is not None)
+
+
+def print_summary(results, tijd, file=sys.stdout):
+    for r in sorted(results, key=lambda r: r['tijd'], reverse=True):
+        detail = r['path'] or r['error'] or ''
+        print(
+            f"{r['status']:<7} {r['tijd']:>7.2f}s  {_naam(r):<30} {detail}",
+            file=file)
+    for r in results:
+        if r['status'] == 'fout':
+            print(f"\n{_naam(r)}:\n{r['traceback']}", file=file)
+        for fout in r.get('fouten', []):
+            print(
+                f"\n{_naam(r)}, {fout['sectie']}: {fout['item']} weggelaten"
+                f"\n{fout['traceback']}",
+                file=file)
+    n = {
+        status: sum(r['status'] == status for r in results)
+        for status in ('ok', 'actueel', 'leeg', 'fout')
+    }
+    print(
+        f"\n{len(results)} rapportages in {tijd:.1f}s: "
+        f"{n['ok']} ok, {n['actueel']} actueel, {n['leeg']} leeg, "
+        f"{n['fout']} fout",
+        file=file)
+    weggelaten = sum(len(r.get('fouten', [])) for r in results)
+    if weggelaten:
+        print(f"{weggelaten} items weggelaten door een fout", file=file)
+    if any('hits' in r for r in results):
+        hits = sum(r.get('hits', 0) for r in results)
+        misses = sum(r.get('misses', 0) for r in results)
+        print(f"grafiekcache: {hits} hits, {misses} misses", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m report.batch',
+        description="Genereer rapportages in batch uit een manifest.")
+    parser.add_argument('manifest', help="pad naar manifest (json)")
+    parser.add_argument(
+        '-o', '--output', default='output', help="map voor html-bestanden")
+    parser.add_argument(
+        '-j', '--workers', type=int, default=os.cpu_count(),
+        help="aantal processen (standaard: aantal cores)")
+    parser.add_argument(
+        '--client-transforms', action='store_true',
+        help="laat aggregatie van grafiekdata over aan de browser")
+    parser.add_argument(
+        '--cache-dir', default=CACHE_PATH, help="map voor grafiekcache")
+    parser.add_argument(
+        '--no-cache', action='store_true', help="gebruik geen grafiekcache")
+    parser.add_argument(
+        '--clear-cache', action='store_true',
+        help="leeg de grafiekcache voor het genereren")
+    parser.add_argument(
+        '--force', action='store_true',
+        help="genereer ook rapportages waarvan de invoer niet veranderd is")
+    parser.add_argument(
+        '--backend', choices=BACKENDS, default='pandas',
+        help="rekenbackend voor selectie en tabellen (standaard: pandas)")
+    parser.add_argument(
+        '--compact', action='store_true',
+        help="houd de export compact (categorisch) in het geheugen")
+    parser.add_argument(
+        '--trace', metavar='DIR',
+        help="schrijf tijd en omvang per sectie en item naar DIR")
+    parser.add_argument(
+        '--trace-memory', action='store_true',
+        help="meet bij --trace ook piekgeheugen (tracemalloc, trager)")
+    args = parser.parse_args(argv)
+
+    if args.clear_cache:
+        ChartCache(args.cache_dir).clear()
+    manifest = lees_manifest(args.manifest)
+    try:
+        plan_rapportages(manifest)
+    except ValueError as e:
+        parser.error(str(e))
+    start = time.perf_counter()
+    results = run(
+        manifest,
+        args.output,
+        args.workers,
+        preaggregate=not args.client_transforms,
+        cache=None if args.no_cache else args.cache_dir,
+        force=args.force,
+        trace=args.trace,
+        trace_memory=args.trace_memory,
+        backend=args.backend,
+        compact=args.compact,
+    )
+    print_summary(results, time.perf_counter() - start)
+    return 1 if any(r['status'] == 'fout' for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Persistente cache van gerenderde grafieken (vega-lite json).
+
+    python -m report.cache {stats,clear} [--path DIR]
+"""
+import argparse
+import hashlib
+import json
+import os
+from functools import cache
+from pathlib import Path
+
+import altair as alt
+
+import report
+
+
+PATH = "data/.cache/charts"
+VERSION = 1  # verhoog bij wijzigingen die de output van grafieken veranderen
+
+
+def hash_files(paths):
+    digest = hashlib.sha1()
+    for path in sorted(Path(p) for p in paths):
+        if path.is_file():
+            digest.update(str(path).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+@cache
+def code_version():
+    """
+    Retourneer hash van de code van `report` (specs, grafieken, tabellen),
+    eenmaal per proces berekend.
+    """
+    return hash_files(Path(report.__file__).parent.rglob('*.py'))
+
+
+def chart_id(obj, item, taal, fingerprint):
+    """
+    Retourneer deterministisch id voor grafiek `obj` gebouwd uit `item`: een
+    hash van item, argumenten, taal, props, vingerafdruk van de data, de
+    inhoud van de spec (`Spec.uuid`: vragen, antwoorden, titel en labels uit
+    PDEF en codings) en de code waarmee de grafiek gebouwd wordt (zie
+    `code_version`, ook in de versies van `batch`).
+    """
+    key = json.dumps(
+        [
+            VERSION,
+            code_version(),
+            alt.__version__,
+            f"{item['item'].__module__}.{item['item'].__qualname__}",
+            item.get('args', []),
+            taal,
+            obj.props,
+            obj.preaggregate,
+            obj.spec.uuid,
+            fingerprint,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return f"uuid-{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+class ChartCache:
+    """
+    Cache van vega-lite specs op schijf, één bestand per chart-id. De totale
+    omvang is begrensd op `max_bytes`; daarboven worden de minst recent
+    gebruikte bestanden verwijderd. Elke `ChartCache` houdt de omvang bij
+    vanaf de stand op schijf bij het openen en telt daar de eigen `put`s bij
+    op; pas als die boven `max_bytes` komt wordt de map opnieuw opgemeten en
+    opgeruimd tot `low` daarvan, zodat ook bestanden van andere processen
+    meetellen. Een lege string betekent dat de grafiek geen data had.
+    """
+    low = 0.9
+
+    def __init__(self, path=PATH, max_bytes=256 * 2**20):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._size = sum(f.stat().st_size for f in self._files())
+
+    def _files(self):
+        return self.path.glob('*.json')
+
+    def _file(self, key):
+        return self.path / f"{key}.json"
+
+    def get(self, key):
+        file = self._file(key)
+        try:
+            value = file.read_text(encoding='utf8')
+            os.utime(file)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        file = self._file(key)
+        tmp = file.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_text(value, encoding='utf8')
+        size = tmp.stat().st_size
+        try:
+            size -= file.stat().st_size
+        except OSError:
+            pass
+        os.replace(tmp, file)
+        self._size += size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Meet de cache op schijf en verwijder minst recent gebruikte
+        bestanden tot deze binnen `low` x `max_bytes` valt.
+        """
+        files = []
+        for f in self._files():
+            try:
+                stat = f.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, f))
+        self._size = sum(size for _, size, _ in files)
+        if self._size <= self.max_bytes:
+            return
+        for _, size, f in sorted(files):
+            if self._size <= self.low * self.max_bytes:
+                break
+            f.unlink(missing_ok=True)
+            self._size -= size
+
+    def clear(self):
+        for f in self._files():
+            f.unlink(missing_ok=True)
+        self._size = 0
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'files': sum(1 for _ in self._files()),
+            'bytes': self._size,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m report.cache')
+    parser.add_argument('command', choices=['stats', 'clear'])
+    parser.add_argument('--path', default=PATH)
+    args = parser.parse_args(argv)
+
+    cache = ChartCache(args.path)
+    if args.command == 'clear':
+        cache.clear()
+    stats = cache.stats
+    print(f"{args.path}: {stats['files']} grafieken, {stats['bytes']:,} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from report.core.spec import Spec
 from report.core.source import Source
 from report.core.chart import Chart
+from report.core.cube import Cube
 import report.core.getters as getters
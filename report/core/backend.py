@@ -0,0 +1,278 @@
+"""
+Rekenbackend voor selectie en aggregatie van formulieren.
+
+Standaard wordt alles in pandas uitgevoerd. Met `configure('polars')` worden
+`selecteer_forms_batch`, het filteren van bronnen (`Source._base`) en de
+tabellen van `Source`, `SourceCijfers`, `SourceTijdsbesteding` en
+`SourceMultiSelect` als lazy polars-queries uitgevoerd. Alleen rijnummers en
+de kleine geaggregeerde resultaten gaan terug naar pandas, voor altair.
+Antwoorden worden in polars als tekst vergeleken.
+
+Met `configure('duckdb')` worden selectie en tabellen als SQL uitgevoerd,
+zie `report.store`; `Source._base` blijft dan in pandas. polars en duckdb
+zijn optioneel.
+"""
+import weakref
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+from report.core.predicate import FORMULIER
+
+
+BACKENDS = ('pandas', 'polars', 'duckdb')
+BACKEND = 'pandas'
+
+
+def configure(backend):
+    """Stel backend in: 'pandas', 'polars' of 'duckdb'."""
+    global BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"onbekende backend {backend!r}, kies uit {', '.join(BACKENDS)}")
+    if backend == 'polars':
+        import polars  # noqa: F401
+    if backend == 'duckdb':
+        import report.store  # noqa: F401
+    BACKEND = backend
+
+
+def is_polars():
+    return BACKEND == 'polars'
+
+
+def is_pushdown():
+    """Worden tabellen buiten pandas berekend?"""
+    return BACKEND != 'pandas'
+
+
+def _duckdb(func):
+    """
+    Voer met de duckdb-backend de gelijknamige functie uit `report.store`
+    uit in plaats van `func`.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if BACKEND == 'duckdb':
+            from report import store
+            return getattr(store, func.__name__)(*args, **kwargs)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+_registry = {}
+
+
+def _formulier(lf):
+    """Kolommen die een formulier identificeren, zie `predicate.sleutel`."""
+    return [
+        col for col in FORMULIER
+        if col in lf.collect_schema().names()]
+
+
+def _text(s):
+    # via de (weinige) unieke waarden; veel sneller dan object -> arrow
+    import polars as pl
+
+    codes, uniques = pd.factorize(s)
+    text = pl.Series([str(i) for i in uniques], dtype=pl.String)
+    text = text.gather(np.maximum(codes, 0)) if len(text) else (
+        pl.Series([None] * len(codes), dtype=pl.String))
+    return text.scatter(np.flatnonzero(codes < 0), None)
+
+
+def frame(data):
+    """
+    Retourneer `data` als polars DataFrame met rijnummer `_row`; wordt
+    eenmalig per dataframe omgezet.
+    """
+    import polars as pl
+
+    key = id(data)
+    if key not in _registry:
+        ids = {
+            col: pl.Series(pd.to_numeric(data[col], errors='coerce'))
+            for col in ('ooa_id', 'studentnummer')
+        }
+        text = {
+            col: _text(data[col])
+            for col in ('collegejaar', 'opleiding', 'processtap', 'antwoord')
+            if col in data.columns
+        }
+        _registry[key] = pl.DataFrame(
+            {'_row': np.arange(len(data)), **ids, **text})
+        weakref.finalize(data, _registry.pop, key, None)
+    return _registry[key]
+
+
+def _codes(values, codes):
+    """Koppel antwoorden (tekst) terug aan de oorspronkelijke codes."""
+    lookup = {str(code): code for code in codes}
+    return [lookup.get(value, value) for value in values]
+
+
+@_duckdb
+def selecteer_forms_batch(df, selecties):
+    """
+    Polars-versie van `report.data.selecteer_forms_batch` voor een
+    genormaliseerde export; alle selecties worden samen en parallel
+    uitgevoerd.
+    """
+    import polars as pl
+
+    lf = frame(df).lazy()
+    queries = []
+    for data, progs, *studentnummers in selecties.values():
+        data = [data] if not isinstance(data, list) else data
+        progs = [progs] if not isinstance(progs, list) else progs
+        studentnummers = studentnummers[0] if studentnummers else None
+
+        forms = lf.filter(pl.col('opleiding').is_in(progs))
+        datum = (
+            pl.col('processtap').str.contains('O_DATUM', literal=True)
+            & pl.col('antwoord').is_in([str(i) for i in data])
+        )
+        if studentnummers is not None:
+            datum &= pl.col('studentnummer').is_in(list(studentnummers))
+        queries.append(
+            forms.filter(datum.any().over(_formulier(lf))).select('_row'))
+    return {
+        key: df.iloc[rows['_row'].to_numpy()]
+        for key, rows in zip(selecties, pl.collect_all(queries))
+    }
+
+
+def _filter(data, processtappen, diploma=None):
+    import polars as pl
+
+    lf = frame(data).lazy()
+    if diploma is not None:
+        vraag, dip = diploma
+        heeft_diploma = (
+            (pl.col('processtap') == vraag)
+            & pl.col('antwoord').is_in(list(dip))
+        )
+        lf = lf.filter(heeft_diploma.any().over(_formulier(lf)))
+    return lf.filter(pl.col('processtap').is_in(list(processtappen)))
+
+
+def take(data, processtappen, diploma=None):
+    """
+    Retourneer rijen van `data` met processtap in `processtappen`, met
+    `diploma` (vraag, antwoorden) alleen van formulieren met een van die
+    antwoorden op de vraag.
+    """
+    rows = _filter(data, processtappen, diploma).select('_row').collect()
+    return data.iloc[rows['_row'].to_numpy()]
+
+
+@_duckdb
+def counts(data, processtappen, codes=()):
+    """
+    Retourneer aantal antwoorden per processtap en antwoord, zoals
+    `Cube.counts` na `select`; antwoorden gelijk aan een van `codes` krijgen
+    die code terug.
+    """
+    import polars as pl
+
+    df = (
+        _filter(data, processtappen)
+        .filter(pl.col('antwoord').is_not_null())
+        .group_by(['processtap', 'antwoord'], maintain_order=True)
+        .len()
+        .collect()
+    )
+    index = pd.MultiIndex.from_arrays(
+        [df['processtap'].to_list(), _codes(df['antwoord'], codes)],
+        names=['processtap', 'antwoord'])
+    n = df['len'].to_numpy().astype(np.int64)
+    return pd.Series(n, index=index, name='n')
+
+
+@_duckdb
+def hours(data, processtappen, breaks):
+    """
+    Retourneer aantal antwoorden per processtap en klasse van uren
+    (`breaks`, rechts gesloten zoals `pd.cut`); klassen als volgnummer.
+    """
+    import polars as pl
+
+    uren = (
+        pl.col('antwoord')
+        .str.strip_chars()
+        .str.replace(',', '.', literal=True)
+        .cast(pl.Float64, strict=False)
+    )
+    klasse = pl.lit(None, dtype=pl.Int64)
+    for i, (lo, hi) in enumerate(zip(breaks[:-1], breaks[1:])):
+        klasse = pl.when((uren > lo) & (uren <= hi)).then(i).otherwise(klasse)
+    df = (
+        _filter(data, processtappen)
+        .select('processtap', klasse.alias('klasse'))
+        .drop_nulls('klasse')
+        .group_by(['processtap', 'klasse'], maintain_order=True)
+        .len()
+        .collect()
+    )
+    index = pd.MultiIndex.from_arrays(
+        [df['processtap'].to_list(), df['klasse'].to_numpy()],
+        names=['processtap', 'klasse'])
+    n = df['len'].to_numpy().astype(np.int64)
+    return pd.Series(n, index=index, name='n')
+
+
+@_duckdb
+def grades(data, processtappen, diploma):
+    """
+    Retourneer processtap en cijfer per antwoord, zoals
+    `SourceCijfers.parse_grades`, voor formulieren met `diploma`.
+    """
+    import polars as pl
+
+    x = (
+        pl.col('antwoord')
+        .str.strip_chars()
+        .str.replace(',', '.', literal=True)
+        .cast(pl.Float64, strict=False)
+    )
+    cijfer = (
+        pl.when(x > 100).then(None)
+        .when(x > 10).then(x / 10)
+        .when(x < 4).then(None)
+        .otherwise(x)
+        .round(0, mode='half_to_even')
+    )
+    df = (
+        _filter(data, processtappen, diploma)
+        .select('processtap', cijfer.alias('antwoord'))
+        .collect()
+    )
+    return pd.DataFrame({
+        'processtap': pd.Series(df['processtap'].to_list(), dtype=object),
+        'antwoord': df['antwoord'].to_numpy().astype(float),
+    })
+
+
+@_duckdb
+def multiselect(data, processtap, sep='|'):
+    """
+    Retourneer aantal studenten per optie (in volgorde van eerste
+    voorkomen) en totaal aantal studenten, zoals `MultiSelect`.
+    """
+    import polars as pl
+
+    lf = _filter(data, [processtap])
+    options = (
+        lf.select('studentnummer', pl.col('antwoord').str.split(sep))
+        .explode('antwoord')
+        .drop_nulls('antwoord')
+        .group_by('antwoord', maintain_order=True)
+        .agg(pl.col('studentnummer').n_unique())
+    )
+    students = lf.select(pl.col('studentnummer').drop_nulls().n_unique())
+    options, students = pl.collect_all([options, students])
+    counts = pd.Series(
+        options['studentnummer'].to_numpy().astype(np.int64),
+        index=pd.Index(options['antwoord'].to_list(), dtype=object))
+    return counts, students.item()
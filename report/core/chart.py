@@ -1,23 +1,32 @@
 import altair as alt
+import numpy as np
+import pandas as pd
 
 
 class Chart:
     """
     Visualiseer data als vega-lite grafiek.
+    Met `preaggregate` worden de transforms uit `_transform` vooraf in pandas
+    uitgevoerd (`_aggregate`), zodat de spec alleen nog encodeert.
     """
     preprocessing = []
     modifiers = {}
+    preaggregate = False
 
-    def __init__(self, source, spec, **props):
+    def __init__(self, source, spec, preaggregate=None, **props):
         self.source = source
         self.spec = spec
         self.props = props
+        if preaggregate is not None:
+            self.preaggregate = preaggregate
 
     @property
     def _base(self):
         source = self.source.table.reset_index()
         for f in self.preprocessing:
             source = source.pipe(f)
+        if self.preaggregate:
+            return alt.Chart(self._aggregate(source))
         base = alt.Chart(source)
         return self._transform(base)
 
@@ -38,6 +47,35 @@ class Chart:
             vraag=vraag_transform,
         )
 
+    def _aggregate(self, source):
+        """
+        Vouw `source` naar lange vorm met aantal, totaal, pct en vraag per
+        processtap en antwoord, gelijk aan de vega-lite transforms in
+        `_transform`. Lege cellen krijgen net als in vega pct 0, antwoorden
+        zonder kolom pct NaN.
+        """
+        fold = self.spec.antw.values
+        counts = source.reindex(columns=fold).to_numpy(dtype=float)
+        present = np.isin(fold, source.columns)
+        totaal = np.nansum(counts, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.where(present, np.nan_to_num(counts), np.nan)
+            pct = pct / totaal[:, None]
+        processtap = source.processtap.to_numpy()
+        vraag = np.array([
+            ' '.join(i) if isinstance(i, list) else i
+            for i in processtap
+        ], dtype=object)
+        k = len(fold)
+        return pd.DataFrame({
+            'processtap': processtap.repeat(k),
+            'antwoord': np.tile(np.array(fold, dtype=object), len(source)),
+            'aantal': counts.ravel(),
+            'totaal': totaal.repeat(k),
+            'pct': pct.ravel(),
+            'vraag': vraag.repeat(k),
+        })
+
     @property
     def _tooltip(self):
         return [
@@ -0,0 +1,145 @@
+import weakref
+
+import pandas as pd
+
+from report.core.predicate import DATUM, sleutel
+
+
+class Cube:
+    """
+    Aantallen antwoorden per opleiding x werkgroep x matchingsdatum x
+    processtap x antwoord, in een enkele groupby over de hele export.
+    Rijen met werkgroep `None` tellen alle formulieren; werkgroepen mogen
+    daardoor overlappen. Een formulier telt onder al zijn matchingsdata
+    (O_DATUM-waarden) tegelijk, als gesorteerde en met `SEP` verbonden
+    tekst in `datum`; zo telt `select` een formulier eenmaal als een van
+    zijn matchingsdata geselecteerd is, zoals `selecteer_forms_batch`.
+
+    :param forms: genormaliseerde export, zie `normaliseer_forms`.
+    :param werkgroepen: dict van werkgroep (str) naar studentnummers.
+    """
+    dims = ['opleiding', 'werkgroep', 'datum', 'processtap', 'antwoord']
+    SEP = '|'
+
+    def __init__(self, forms, werkgroepen=None):
+        werkgroepen = {} if werkgroepen is None else werkgroepen
+        is_datum = DATUM.mask(forms)
+        formulier = sleutel(forms)
+        datum = (
+            pd.DataFrame({
+                'formulier': formulier[is_datum].to_numpy(),
+                'datum': forms.antwoord[is_datum].astype(object).to_numpy(),
+            })
+            .dropna()
+            .drop_duplicates()
+            .sort_values('datum')
+            .groupby('formulier', sort=False)
+            .datum
+            .agg(self.SEP.join)
+        )
+        notna = forms.antwoord.notna().to_numpy()
+        rows = (
+            forms
+            .loc[notna, [
+                'ooa_id', 'studentnummer', 'opleiding',
+                'processtap', 'antwoord']]
+            .assign(datum=formulier.map(datum).to_numpy()[notna])
+        )
+        frames = [rows.assign(werkgroep=None)] + [
+            rows.loc[rows.studentnummer.isin(studentnummers)]
+            .assign(werkgroep=werkgroep)
+            for werkgroep, studentnummers in werkgroepen.items()
+        ]
+        self.counts = (
+            pd.concat(frames)
+            .groupby(self.dims, dropna=False, sort=False, observed=True)
+            .size()
+            .rename('n')
+        )
+
+    @classmethod
+    def from_counts(cls, counts):
+        """
+        Retourneer cube met elders berekende aantallen (index `dims`), zie
+        `Store.cube`.
+        """
+        cube = cls.__new__(cls)
+        cube.counts = counts
+        return cube
+
+    def select(self, data, progs, werkgroep=None):
+        """
+        Retourneer aantallen per processtap x antwoord voor formulieren met
+        matchingsdatum in `data` van opleiding(en) `progs` en `werkgroep`
+        (`None` voor alle formulieren).
+        """
+        data = [data] if not isinstance(data, list) else data
+        progs = [progs] if not isinstance(progs, list) else progs
+        index = self.counts.index
+        datums = index.get_level_values('datum')
+        data = set(data)
+        gekozen = [
+            datum for datum in datums.unique()
+            if isinstance(datum, str)
+            and not data.isdisjoint(datum.split(self.SEP))
+        ]
+        mask = (
+            index.get_level_values('opleiding').isin(progs)
+            & datums.isin(gekozen)
+        )
+        werkgroepen = index.get_level_values('werkgroep')
+        mask &= (
+            werkgroepen.isna() if werkgroep is None
+            else werkgroepen == werkgroep
+        )
+        counts = (
+            self.counts[mask]
+            .groupby(['processtap', 'antwoord'], sort=False, observed=True)
+            .sum()
+        )
+        return CubeSlice(counts)
+
+
+class CubeSlice:
+    """
+    Aantallen per processtap x antwoord voor de formulieren van een
+    rapportage. Koppel via `attach` aan het dataframe met geselecteerde
+    formulieren; `Source.table` gebruikt dan deze aantallen in plaats van de
+    losse rijen te pivoteren.
+    """
+    _registry = {}
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    def attach(self, data):
+        key = id(data)
+        self._registry[key] = self
+        weakref.finalize(data, self._registry.pop, key, None)
+        return data
+
+    @classmethod
+    def of(cls, data):
+        return cls._registry.get(id(data))
+
+    def table(self, spec):
+        processtappen = self.counts.index.get_level_values('processtap')
+        counts = self.counts[processtappen.isin(spec.vragen.keys)]
+        if counts.empty:
+            return None
+        base = counts.reset_index().assign(
+            processtap=lambda df: [spec.vragen[i] for i in df.processtap],
+            antwoord=lambda df: [spec.antw.get(i, i) for i in df.antwoord],
+        )
+        cols = [
+            col for col in spec.antw.values
+            if col in base.antwoord.values]
+        return (
+            base
+            .pivot_table(
+                index='processtap',
+                columns='antwoord',
+                values='n',
+                aggfunc='sum')
+            [cols] # order columns
+        )
@@ -1,17 +1,185 @@
+import hashlib
+import os
+import threading
 from collections import UserDict
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 
-path = "data/ooa.ba2223.matching.pdef.xlsx"
-PDEF = {
-    'ps': pd.read_excel(path, index_col=0),
-    'antw': pd.read_excel(path, sheet_name='antw', index_col=0),
+PATHS = {
+    'pdef': "data/ooa.ba2223.matching.pdef.xlsx",
+    'codings': "data/codings.xlsx",
+    'cache': "data/.cache",
 }
-SPECIFICATIONS = pd.read_excel("data/codings.xlsx").set_index('code')
+_LOADED = {}
+
+
+def configure(pdef=None, codings=None, cache=None):
+    """
+    Stel paden in naar PDEF, codings en sidecar-cache. Eerder geladen
+    workbooks blijven in het geheugen, zodat meerdere collegejaren naast
+    elkaar gebruikt kunnen worden.
+    """
+    for key, val in {'pdef': pdef, 'codings': codings, 'cache': cache}.items():
+        if val is not None:
+            PATHS[key] = str(val)
+
+
+def _signature(path):
+    path = Path(path).resolve()
+    stat = path.stat()
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+def read_excel_cached(path, sheet_name=0) -> pd.DataFrame:
+    """
+    Lees sheet uit workbook via binaire sidecar-cache (feather).
+    Cache is gesleuteld op pad, mtime en grootte van het bronbestand; bij een
+    wijziging van het workbook wordt deze opnieuw opgebouwd. Zonder pyarrow
+    of bij een onleesbare cache wordt direct uit Excel gelezen.
+    """
+    key = hashlib.sha1(repr((*_signature(path), sheet_name)).encode())
+    cache = Path(PATHS['cache']) / f"{Path(path).stem}.{key.hexdigest()}.feather"
+    try:
+        return _restore_nan(pd.read_feather(cache))
+    except (ImportError, OSError, ValueError):
+        # ValueError omvat pyarrow's ArrowInvalid (beschadigde cache)
+        pass
+    df = pd.read_excel(path, sheet_name=sheet_name)
+    tmp = cache.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        df.to_feather(tmp)
+        os.replace(tmp, cache)
+    except (ImportError, ValueError, TypeError, OSError):
+        tmp.unlink(missing_ok=True)
+    return df
+
+
+def _restore_nan(df):
+    """
+    Feather leest ontbrekende waarden in objectkolommen terug als None;
+    zet deze terug naar NaN, zoals `read_excel` ze oplevert.
+    """
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _read_pdef(path):
+    return {
+        sheet: df.set_index(df.columns[0])
+        for sheet, df in {
+            'ps': read_excel_cached(path),
+            'antw': read_excel_cached(path, sheet_name='antw'),
+        }.items()
+    }
+
+
+def _index_pdef(pdef):
+    ps, antw = pdef['ps'], pdef['antw']
+    index = {'vraag': {}, 'antw': {}, 'memo': {}}
+    for col in ps.columns[ps.columns.str.startswith('tekst_')]:
+        taal = col.removeprefix('tekst_')
+        for key, val in zip(ps.processtap, ps[col]):
+            index['vraag'][key, taal] = Map({key: val})
+    for col in antw.columns[antw.columns.str.startswith('antwoord_')]:
+        if col == 'antwoord_code':
+            continue
+        taal = col.removeprefix('antwoord_')
+        for key, group in antw.groupby('processtap', sort=False):
+            index['antw'][key, taal] = Map(
+                zip(group.antwoord_code, group[col]))
+    return index
+
+
+def _read_specifications(path):
+    return read_excel_cached(path).set_index('code')
+
+
+def _index_specifications(specifications):
+    index = {'memo': {}}
+    talen = specifications.columns.drop(['ps', 'type'], errors='ignore')
+    for (ps, type_), group in specifications.groupby(
+        ['ps', 'type'], sort=False):
+        for taal in talen:
+            index[type_, ps, taal] = Map(group[taal].to_dict())
+    return index
+
+
+_LOADERS = {
+    'pdef': (_read_pdef, _index_pdef),
+    'codings': (_read_specifications, _index_specifications),
+}
+
+
+def _load(name, path=None):
+    """
+    Laad bestand `name` eenmalig per versie van het bestand, samen met de
+    bijbehorende opzoektabellen.
+    """
+    path = PATHS[name] if path is None else path
+    key = (name, *_signature(path))
+    if key not in _LOADED:
+        read, build_index = _LOADERS[name]
+        data = read(path)
+        _LOADED[key] = data, build_index(data)
+    return _LOADED[key]
+
+
+def _memoize(index, key, func):
+    memo = index['memo']
+    if key not in memo:
+        memo[key] = func()
+    return memo[key]
+
+
+def load_pdef(path=None) -> dict:
+    """
+    Retourneer PDEF (sheets 'ps' en 'antw') uit `path`, standaard
+    `PATHS['pdef']`. Wordt eenmalig per versie van het bestand geladen.
+    """
+    return _load('pdef', path)[0]
+
+
+def load_specifications(path=None) -> pd.DataFrame:
+    """
+    Retourneer codings uit `path`, standaard `PATHS['codings']`. Wordt
+    eenmalig per versie van het bestand geladen.
+    """
+    return _load('codings', path)[0]
+
+
+def __getattr__(name):
+    if name == 'PDEF':
+        return load_pdef()
+    if name == 'SPECIFICATIONS':
+        return load_specifications()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Map(UserDict):
+    """
+    Onveranderlijke, geordende dict. Getters retourneren gedeelde instanties
+    uit de opzoektabellen; wijzig deze dus niet maar maak een nieuwe `Map`.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._frozen = True
+
+    def __setitem__(self, key, item):
+        if getattr(self, '_frozen', False):
+            raise TypeError("'Map' object does not support item assignment")
+        super().__setitem__(key, item)
+
+    def __delitem__(self, key):
+        raise TypeError("'Map' object does not support item deletion")
+
+    def copy(self):
+        return Map(self.data)
+
     @property
     def values(self):
         return list(self.data.values())
@@ -29,10 +197,17 @@ def VraagItemsFromPDEF(processtap, /, taal) -> dict:
     Retourneer uit PDEF tekst vraag in `taal` per opgegeven processtap(pen) als
     dict.
     """
-    processtap = [processtap] if isinstance(processtap, str) else processtap
-    data = PDEF['ps'].set_index('processtap').loc[processtap, f'tekst_{taal}']
-    return Map(data.to_dict())
-
+    index = _load('pdef')[1]
+    if isinstance(processtap, str):
+        return index['vraag'][processtap, taal]
+    return _memoize(
+        index,
+        ('vraag', tuple(processtap), taal),
+        lambda: Map({
+            ps: index['vraag'][ps, taal][ps]
+            for ps in processtap
+        }),
+    )
 
 
 def TitelFromPDEF(processtap, /, taal) -> str:
@@ -41,11 +216,23 @@ def TitelFromPDEF(processtap, /, taal) -> str:
 
 def VraagItemsQueryFromPDEF(qry, /, taal) -> dict:
     """
-    Retourneer uit PDEF tekst vraag in `taal` per via opgegeven query gevonden
-    processtap(pen) als dict.
+    Retourneer uit PDEF tekst vraag in `taal` per via opgegeven query
+    (predicaat, zie `report.core.predicate`, of querystring voor
+    `DataFrame.query`) gevonden processtap(pen) als dict.
     """
-    data = PDEF['ps'].query(qry).set_index('processtap').loc[:, f'tekst_{taal}']
-    return Map(data.to_dict())
+    pdef, index = _load('pdef')
+    select = (
+        (lambda df: df.query(qry)) if isinstance(qry, str) else qry.select)
+    return _memoize(
+        index,
+        ('query', qry, taal),
+        lambda: Map(
+            select(pdef['ps'])
+            .set_index('processtap')
+            .loc[:, f'tekst_{taal}']
+            .to_dict()
+        ),
+    )
 
 
 def AntwItemsFromPDEF(ps, /, taal) -> dict:
@@ -53,14 +240,21 @@ def AntwItemsFromPDEF(ps, /, taal) -> dict:
     Retourneer voor opgegeven processtap uit PDEF tekst antwoord in `taal` per
     antwoordcode als geordende categorische dict.
     """
+    pdef, index = _load('pdef')
+    if isinstance(ps, str) and (ps, taal) in index['antw']:
+        return index['antw'][ps, taal]
     ps = [ps] if isinstance(ps, str) else ps
-    data = (
-        PDEF['antw']
-        .query("processtap in @ps")
-        .set_index('antwoord_code')
-        .loc[:, f'antwoord_{taal}']
+    return _memoize(
+        index,
+        ('antw', tuple(ps), taal),
+        lambda: Map(
+            pdef['antw']
+            .loc[lambda df: df.processtap.isin(ps)]
+            .set_index('antwoord_code')
+            .loc[:, f'antwoord_{taal}']
+            .to_dict()
+        ),
     )
-    return Map(data.to_dict())
 
 
 def VraagItemsFromJSON(key, /, taal) -> dict:
@@ -72,12 +266,8 @@ def AntwItemsFromJSON(key, /, taal) -> dict:
 
 
 def VraagItemsFromSPEC(ps, /, taal):
-    crit = lambda df: (df.ps == ps) & (df.type == 'Q')
-    data= SPECIFICATIONS.loc[crit, taal]
-    return Map(data.to_dict())
+    return _load('codings')[1].get(('Q', ps, taal), Map())
 
 
 def AntwItemsFromSPEC(ps, /, taal):
-    crit = lambda df: (df.ps == ps) & (df.type == 'A')
-    data= SPECIFICATIONS.loc[crit, taal]
-    return Map(data.to_dict())
+    return _load('codings')[1].get(('A', ps, taal), Map())
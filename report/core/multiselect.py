@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from report.core.source import Partition
+
+
+class MultiSelect:
+    """
+    Indicatormatrix (student x optie) van meerkeuze-antwoorden, gescheiden
+    door `sep`. Alleen de coördinaten van gekozen opties worden bewaard
+    (sparse); aantallen, co-occurrence en totalen per subgroep zijn reducties
+    daarover. Een optie telt per student hooguit één keer.
+    """
+    def __init__(self, data, sep='|'):
+        student_codes, self.students = pd.factorize(data.studentnummer)
+        answers = (
+            data.antwoord
+            .reset_index(drop=True)
+            .str.split(sep)
+            .explode()
+            .dropna()
+        )
+        option_codes, self.options = pd.factorize(answers)
+        k = max(len(self.options), 1)
+        cells = np.unique(
+            student_codes[answers.index.to_numpy()] * k + option_codes)
+        self.rows, self.cols = np.divmod(cells, k)
+
+    @classmethod
+    def of(cls, data, processtap):
+        """
+        Retourneer indicatormatrix van `processtap` in `data`; wordt eenmalig
+        per dataframe en processtap opgebouwd.
+        """
+        partition = Partition.of(data)
+        key = (cls, processtap)
+        if key not in partition.derived:
+            partition.derived[key] = cls(partition.take(processtap))
+        return partition.derived[key]
+
+    @property
+    def shape(self):
+        return len(self.students), len(self.options)
+
+    def counts(self):
+        """
+        Retourneer aantal studenten per optie.
+        """
+        return pd.Series(
+            np.bincount(self.cols, minlength=len(self.options)),
+            index=self.options,
+        )
+
+    def cooccurrence(self):
+        """
+        Retourneer aantal studenten per combinatie van twee opties; de
+        diagonaal bevat `counts`.
+        """
+        k = len(self.options)
+        cells = pd.DataFrame({'row': self.rows, 'col': self.cols})
+        pairs = cells.merge(cells, on='row')
+        counts = np.bincount(
+            pairs.col_x.to_numpy() * k + pairs.col_y.to_numpy(),
+            minlength=k * k,
+        )
+        return pd.DataFrame(
+            counts.reshape(k, k), index=self.options, columns=self.options)
+
+    def totals(self, groups):
+        """
+        Retourneer per subgroep aantal studenten per optie en totaal aantal
+        studenten (`n`). `groups` koppelt studentnummer aan subgroep;
+        studenten zonder subgroep tellen niet mee.
+        """
+        k = len(self.options)
+        group_codes, labels = pd.factorize(
+            pd.Series(groups).reindex(self.students))
+        codes = group_codes[self.rows]
+        keep = codes >= 0
+        counts = np.bincount(
+            codes[keep] * k + self.cols[keep],
+            minlength=len(labels) * k,
+        )
+        n = np.bincount(group_codes[group_codes >= 0], minlength=len(labels))
+        return (
+            pd.DataFrame(
+                counts.reshape(len(labels), k),
+                index=labels,
+                columns=self.options)
+            .assign(n=n)
+        )
@@ -0,0 +1,282 @@
+"""
+Filters op formulieren als predicaten, te evalueren tot booleaanse maskers.
+
+    diploma = (col('processtap') == 'U_HBO_TOEGANG') & col('antwoord').isin(['HAVO'])
+    rows = (col('processtap').isin(vragen) & diploma.per('ooa_id')).select(data)
+
+Maskers worden bewaard in `MASKS`, per dataframe en predicaat, zodat
+hetzelfde filter op hetzelfde dataframe (bijvoorbeeld de diplomaselectie van
+een cijfertabel en -grafiek) maar eenmaal berekend wordt. Een dataframe wordt
+herkend aan zijn identiteit, zoals bij `Partition`; pas `data` dus niet meer
+in-place aan. Tekstfilters (`contains`) worden per unieke waarde van een
+kolom geëvalueerd in plaats van per rij.
+"""
+import re
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+MAX_BYTES = 256 * 2**20
+
+
+class MaskCache:
+    """
+    LRU-cache van maskers per (dataframe, predicaat), begrensd op
+    `max_bytes`. Maskers van een dataframe verdwijnen met het dataframe.
+    Maskers zijn alleen-lezen.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._masks = OrderedDict()
+        self._frames = set()
+        self._dead = []
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, data, predicate):
+        key = (id(data), predicate)
+        with self._lock:
+            self._purge()
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                self.hits += 1
+                return mask
+            self.misses += 1
+        mask = np.asarray(predicate._evaluate(data), dtype=bool)
+        mask.flags.writeable = False
+        with self._lock:
+            if key[0] not in self._frames:
+                self._frames.add(key[0])
+                weakref.finalize(data, self._dead.append, key[0])
+            if key not in self._masks:
+                self._masks[key] = mask
+                self._size += mask.nbytes
+                self._evict()
+        return mask
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._masks) > 1:
+            _, mask = self._masks.popitem(last=False)
+            self._size -= mask.nbytes
+
+    def _purge(self):
+        # maskers van opgeruimde dataframes, voordat hun id hergebruikt wordt;
+        # niet in de finalizer zelf, die kan afgaan terwijl `_lock` bezet is
+        while self._dead:
+            frame = self._dead.pop()
+            self._frames.discard(frame)
+            for key in [key for key in self._masks if key[0] == frame]:
+                self._size -= self._masks.pop(key).nbytes
+
+    def clear(self):
+        with self._lock:
+            self._purge()
+            self._masks.clear()
+            self._size = 0
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'masks': len(self._masks),
+            'bytes': self._size,
+        }
+
+
+MASKS = MaskCache()
+
+
+def configure(max_bytes=MAX_BYTES):
+    """Stel de omvang van de maskercache in; 0 bewaart alleen het laatste."""
+    MASKS.max_bytes = max_bytes
+    with MASKS._lock:
+        MASKS._evict()
+
+
+class Predicate:
+    """
+    Filter op rijen van een dataframe. Combineer met `&`, `|` en `~`.
+    Predicaten zijn hashbaar en vergelijkbaar op inhoud.
+    """
+
+    @property
+    def _key(self):
+        raise NotImplementedError
+
+    def _evaluate(self, data):
+        raise NotImplementedError
+
+    def mask(self, data):
+        """Retourneer (gecachet) booleaans masker over de rijen van `data`."""
+        return MASKS.get(data, self)
+
+    def select(self, data):
+        """Retourneer rijen van `data` die voldoen, in oorspronkelijke volgorde."""
+        return data.iloc[np.flatnonzero(self.mask(data))]
+
+    def per(self, by=None):
+        """
+        Retourneer predicaat voor alle rijen van groepen in kolom(men) `by`
+        met ten minste een rij die voldoet; standaard per formulier, zie
+        `sleutel`.
+        """
+        return Per(self, by)
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._key == other._key
+
+    def __hash__(self):
+        return hash((type(self).__name__, self._key))
+
+    def __repr__(self):
+        args = ', '.join(map(repr, self._key))
+        return f"{type(self).__name__}({args})"
+
+
+class Column:
+    """Kolom waarop een predicaat gemaakt wordt, zie `col`."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, value):
+        return IsIn(self.name, [value])
+
+    def isin(self, values):
+        return IsIn(self.name, values)
+
+    def contains(self, pattern, regex=True):
+        return Contains(self.name, pattern, regex)
+
+
+def col(name):
+    return Column(name)
+
+
+class IsIn(Predicate):
+    def __init__(self, column, values):
+        self.column = column
+        self.values = frozenset(values)
+
+    @property
+    def _key(self):
+        return (self.column, self.values)
+
+    def _evaluate(self, data):
+        s = data[self.column]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            # via de categorieën; codes -1 (ontbrekend) vallen op False
+            hit = np.append(s.cat.categories.isin(self.values), False)
+            return hit[s.cat.codes.to_numpy()]
+        return s.isin(self.values).to_numpy(dtype=bool)
+
+
+class Contains(Predicate):
+    def __init__(self, column, pattern, regex=True):
+        self.column = column
+        self.pattern = pattern
+        self.regex = regex
+
+    @property
+    def _key(self):
+        return (self.column, self.pattern, self.regex)
+
+    def _test(self, value):
+        if not isinstance(value, str):
+            return False
+        if self.regex:
+            return re.search(self.pattern, value) is not None
+        return self.pattern in value
+
+    def _evaluate(self, data):
+        s = data[self.column]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes, uniques = s.cat.codes.to_numpy(), s.cat.categories
+        else:
+            codes, uniques = pd.factorize(s)
+        hit = np.array([self._test(value) for value in uniques] + [False])
+        return hit[codes]
+
+
+class And(Predicate):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    @property
+    def _key(self):
+        return (self.left, self.right)
+
+    def _evaluate(self, data):
+        return self.left.mask(data) & self.right.mask(data)
+
+
+class Or(And):
+    def _evaluate(self, data):
+        return self.left.mask(data) | self.right.mask(data)
+
+
+class Not(Predicate):
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    @property
+    def _key(self):
+        return (self.predicate,)
+
+    def _evaluate(self, data):
+        return ~self.predicate.mask(data)
+
+
+class Per(Predicate):
+    def __init__(self, predicate, by=None):
+        by = FORMULIER if by is None else by
+        self.predicate = predicate
+        self.by = by if isinstance(by, str) else tuple(by)
+
+    @property
+    def _key(self):
+        return (self.predicate, self.by)
+
+    def _evaluate(self, data):
+        s = sleutel(data, self.by)
+        ids = s.to_numpy()[self.predicate.mask(data)]
+        return s.isin(pd.unique(ids)).to_numpy(dtype=bool)
+
+
+FORMULIER = ('collegejaar', 'ooa_id')
+
+
+def sleutel(data, by=FORMULIER):
+    """
+    Retourneer per rij van `data` de groep in kolommen `by`; kolommen die
+    niet in `data` staan tellen niet mee. Standaard het formulier: `ooa_id`,
+    binnen `collegejaar` voor formulieren uit meerdere collegejaren (zie
+    `Store.selecteer_forms_batch`).
+    """
+    by = [by] if isinstance(by, str) else by
+    cols = [col for col in by if col in data.columns]
+    if len(cols) == 1:
+        return data[cols[0]]
+    return data.groupby(cols, sort=False, dropna=False, observed=True).ngroup()
+
+
+DATUM = col('processtap').contains('O_DATUM', regex=False)
@@ -1,21 +1,128 @@
+import weakref
 from functools import cached_property
 
+import numpy as np
+import pandas as pd
+
+from report.core import backend
+from report.core.cube import CubeSlice
+from report.core.predicate import col
+
+
+def decategorize(data):
+    """
+    Retourneer `data` met categorische kolommen (zie `compacteer_forms`) als
+    object, om de rijen van een bron te vertalen en te pivoteren.
+    """
+    cols = {
+        col: object for col, dtype in data.dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype)
+    }
+    return data.astype(cols) if cols else data
+
+
+class Partition:
+    """
+    Index van rijposities in `data` per processtap.
+    Wordt eenmalig per dataframe opgebouwd en gedeeld door alle bronnen die
+    op hetzelfde dataframe werken; pas `data` daarna dus niet meer in-place
+    aan. Daarvan afgeleide structuren kunnen in `derived` bewaard worden.
+    `data` wordt alleen zwak vastgehouden, zodat index en `derived` met het
+    dataframe verdwijnen; structuren in `derived` mogen `data` dus ook niet
+    vasthouden.
+    """
+    _registry = {}
+
+    def __init__(self, data):
+        self._data = weakref.ref(data)
+        self.groups = (
+            data.groupby('processtap', sort=False, observed=True).indices)
+        self.derived = {}
+
+    @classmethod
+    def of(cls, data):
+        key = id(data)
+        if key not in cls._registry:
+            cls._registry[key] = cls(data)
+            weakref.finalize(data, cls._registry.pop, key, None)
+        return cls._registry[key]
+
+    def take(self, processtappen):
+        """
+        Retourneer rijen van opgegeven processtap(pen) in oorspronkelijke
+        volgorde.
+        """
+        processtappen = (
+            [processtappen] if isinstance(processtappen, str)
+            else processtappen
+        )
+        data = self._data()
+        idx = [self.groups[ps] for ps in processtappen if ps in self.groups]
+        if not idx:
+            return data.iloc[:0]
+        return data.iloc[np.sort(np.concatenate(idx))]
+
+
+class shared_property(cached_property):
+    """
+    `cached_property` die bij bronnen uit `Source.of` gedeeld wordt door alle
+    bronnen met dezelfde sleutel. De waarde mag `data` niet vasthouden.
+    """
+    def __get__(self, instance, owner=None):
+        shared = None if instance is None else instance.__dict__.get('_shared')
+        if shared is None:
+            return super().__get__(instance, owner)
+        if self.attrname not in shared:
+            shared[self.attrname] = self.func(instance)
+        instance.__dict__[self.attrname] = shared[self.attrname]
+        return shared[self.attrname]
+
 
 class Source:
     """
     Brondata.
-    Vertaalt en ordent vraag en antwoorden volgens `spec`.
+    Vertaalt en ordent vraag en antwoorden volgens `spec`, eventueel
+    beperkt tot rijen die voldoen aan predicaat `query`.
     """
-    query : str = "processtap in @self.spec.vragen"
+    query = None
 
     def __init__(self, data, spec):
         self.data = data
         self.spec = spec
 
+    @classmethod
+    def of(cls, data, spec):
+        """
+        Retourneer bron voor `data` en `spec` die `_base` en `table` deelt
+        met andere bronnen uit `of` met dezelfde bronklasse, vragen,
+        antwoorden en labels (bijvoorbeeld een tabel en grafiek die alleen
+        in titel verschillen). De gedeelde waarden worden bij de `Partition`
+        van `data` bewaard.
+        """
+        key = (
+            'source', cls,
+            tuple(spec.vragen.items()),
+            tuple(spec.antw.items()),
+            tuple(spec.labels.items()),
+        )
+        source = cls(data, spec)
+        source._shared = Partition.of(data).derived.setdefault(key, {})
+        return source
+
     @property
+    def processtappen(self):
+        return self.spec.vragen.keys
+
+    @shared_property
     def _base(self):
-        base = self.data.query(self.query)
-        return self._transform(base)
+        if self.query is not None:
+            query = col('processtap').isin(self.processtappen) & self.query
+            base = query.select(self.data)
+        elif backend.is_polars():
+            base = backend.take(self.data, self.processtappen)
+        else:
+            base = Partition.of(self.data).take(self.processtappen)
+        return self._transform(decategorize(base))
 
     def _transform(self, data):
         return (
@@ -25,8 +132,15 @@ class Source:
                 'antwoord': self.spec.antw})
         )
 
-    @cached_property
+    @shared_property
     def table(self):
+        cube = CubeSlice.of(self.data)
+        if cube is not None and self.query is None:
+            return cube.table(self.spec)
+        if backend.is_pushdown() and self.query is None:
+            counts = backend.counts(
+                self.data, self.processtappen, self.spec.antw.keys)
+            return CubeSlice(counts).table(self.spec)
         if self._base.empty:
             return None
         cols = [
@@ -44,5 +158,5 @@ class Source:
     @classmethod
     def from_processtap(cls, data, spec):
         source = cls(data, spec)
-        source.query = "processtap in @self.spec.vragen"
+        source.query = None
         return source
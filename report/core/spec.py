@@ -1,4 +1,4 @@
-from uuid import uuid4
+import hashlib
 from functools import cached_property
 
 import pandas as pd
@@ -27,7 +27,8 @@ LABELS = {
 class Spec:
     def __init__(self, vragen, antw, taal, titel=None, labels=None):
         labels = {} if labels is None else labels
-        self.uuid = f'uuid-{uuid4()}'
+        content = repr((vragen, antw, titel, labels, taal))
+        self.uuid = f'uuid-{hashlib.sha1(content.encode()).hexdigest()}'
         self.vragen = vragen
         self.antw = antw
         self.titel = titel
@@ -1,5 +1,88 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
+from report.core import backend
+from report.core.predicate import DATUM, sleutel
+
+
+ANTWOORD_COLS = [
+    'systeem_antwoord_code',
+    'gesloten_antwoord_code',
+    'open_antwoord_student',
+]
+
+
+COMPACT_COLS = ['opleiding', 'processtap', 'antwoord']
+ID_COLS = ['ooa_id', 'studentnummer']
+
+
+def compacteer_forms(df):
+    """
+    Return normalized forms with text columns as categoricals and ids
+    downcast to the smallest integer type that fits. Every form repeats the
+    same programmes, processtappen and answer codes, so this takes a
+    fraction of the memory of a Python string per cell.
+
+    Parameters
+    ==========
+    :param df: pd.DataFrame
+        Normalized forms, see `normaliseer_forms`.
+
+    Returns
+    =======
+    compact forms
+        pd.DataFrame
+    """
+    return df.assign(**{
+        col: df[col].astype('category')
+        for col in COMPACT_COLS if col in df.columns
+    }, **{
+        col: pd.to_numeric(df[col], downcast='integer')
+        for col in ID_COLS if col in df.columns
+    })
+
+
+def normaliseer_forms(df, compact=False):
+    """
+    Return export with answer columns coalesced into `antwoord`.
+    Frames that are already normalized are returned as is, so the export
+    only needs to be normalized once for any number of selections.
+
+    Parameters
+    ==========
+    :param df: pd.DataFrame
+        OOA export.
+    :param compact: bool
+        Return compact forms, see `compacteer_forms`.
+
+    Returns
+    =======
+    normalized forms
+        pd.DataFrame
+    """
+    if 'antwoord' not in df.columns or 'systeem_antwoord_code' in df.columns:
+        df = _coalesce(df)
+    return compacteer_forms(df) if compact else df
+
+
+def _coalesce(df):
+    return (
+        df
+        .astype(dtype={col:object for col in ['processtap', *ANTWOORD_COLS]})
+        .assign(
+            antwoord=lambda df: (
+                df.systeem_antwoord_code
+                .fillna(df.gesloten_antwoord_code)
+                .fillna(df.open_antwoord_student)))
+        .drop(columns=ANTWOORD_COLS)
+    )
+
 
 def selecteer_forms(df, data, progs, studentnummers=None):
     """
@@ -17,33 +100,218 @@ def selecteer_forms(df, data, progs, studentnummers=None):
     loaded forms
         pd.DataFrame
     """
-    data = [data] if not isinstance(data, list) else data
-    progs = [progs] if not isinstance(progs, list) else progs
+    selectie = (data, progs, studentnummers)
+    return selecteer_forms_batch(df, {None: selectie})[None]
 
-    cols = [
-        'processtap',
-        'systeem_antwoord_code',
-        'gesloten_antwoord_code',
-        'open_antwoord_student',
-    ]
 
-    df = (
-        df
-        .astype(dtype={col:object for col in cols})
-        .assign(
-            antwoord=lambda df: (
-                df.systeem_antwoord_code
-                .fillna(df.gesloten_antwoord_code)
-                .fillna(df.open_antwoord_student)))
-        .drop(columns=[
-            'systeem_antwoord_code',
-            'gesloten_antwoord_code',
-            'open_antwoord_student'])
-        .query("opleiding in @progs")
+def selecteer_forms_batch(df, selecties):
+    """
+    Return forms for many selections of matching dates and programmes.
+    The export is normalized and indexed by programme once; each selection
+    then only costs a membership test on the rows of its own programmes.
+    With the polars or duckdb backend the selections run as queries, see
+    `report.core.backend`.
+
+    Parameters
+    ==========
+    :param df: pd.DataFrame
+        OOA export, raw or normalized.
+    :param selecties: dict
+        Mapping of key to tuple (matching dates, programmes) or
+        (matching dates, programmes, studentnummers), as accepted by
+        `selecteer_forms`.
+
+    Returns
+    =======
+    loaded forms per key
+        dict of pd.DataFrame
+    """
+    df = normaliseer_forms(df)
+    if backend.is_pushdown():
+        return backend.selecteer_forms_batch(df, selecties)
+    by_prog = df.groupby('opleiding', sort=False).indices
+    is_datum = DATUM.mask(df)
+    formulier = sleutel(df)
+    isin = lambda s, values: s.isin(values).to_numpy(dtype=bool)
+
+    forms = {}
+    for key, (data, progs, *studentnummers) in selecties.items():
+        data = [data] if not isinstance(data, list) else data
+        progs = [progs] if not isinstance(progs, list) else progs
+        studentnummers = studentnummers[0] if studentnummers else None
+
+        idx = [by_prog[prog] for prog in progs if prog in by_prog]
+        rows = (
+            np.sort(np.concatenate(idx)) if idx
+            else np.array([], dtype=np.intp)
+        )
+        mask = is_datum[rows] & isin(df.antwoord.iloc[rows], data)
+        if studentnummers is not None:
+            mask &= isin(df.studentnummer.iloc[rows], studentnummers)
+        ids = formulier.iloc[rows[mask]].unique()
+        rows = rows[isin(formulier.iloc[rows], ids)]
+        forms[key] = df.iloc[rows]
+    return forms
+
+
+def lees_export(path, columns=None, filters=None):
+    """
+    Return OOA export read from `path` (xlsx, csv, pickle or a parquet store
+    written by `importeer_export`). Parquet is scanned lazily: only the
+    requested columns and row groups matching `filters` are read, from a
+    memory map.
+
+    Parameters
+    ==========
+    :param path: {str or Path}
+        Location of the export.
+    :param columns: {list}
+        Columns to read (parquet only).
+    :param filters: {list}
+        Filters pushed down to the parquet scan, e.g.
+        [('opleiding', 'in', ['B GEO'])].
+
+    Returns
+    =======
+    export
+        pd.DataFrame
+    """
+    suffix = str(path).rsplit('.', 1)[-1].lower()
+    if Path(path).is_dir() or suffix == 'parquet':
+        return pd.read_parquet(
+            path, columns=columns, filters=filters, memory_map=True)
+    if suffix == 'csv':
+        return pd.read_csv(path)
+    if suffix in ('pkl', 'pickle'):
+        return pd.read_pickle(path)
+    return pd.read_excel(path)
+
+
+EXPORT_COLS = ['ooa_id', 'studentnummer', 'opleiding', 'processtap']
+STORE = "data/store"
+
+
+def _lees_chunks(path, chunksize):
+    columns = [*EXPORT_COLS, *ANTWOORD_COLS]
+    if str(path).lower().endswith('.csv'):
+        yield from pd.read_csv(
+            path, usecols=columns, dtype=object, chunksize=chunksize)
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = list(next(rows))
+        idx = [header.index(col) for col in columns]
+        chunk = []
+        for row in rows:
+            chunk.append([row[i] for i in idx])
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=columns, dtype=object)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _as_text(s):
+    return s.astype('string').astype(object).where(s.notna(), None)
+
+
+def _normaliseer_chunk(chunk):
+    return normaliseer_forms(chunk).assign(
+        ooa_id=lambda df: pd.to_numeric(df.ooa_id).astype('Int64'),
+        studentnummer=lambda df: (
+            pd.to_numeric(df.studentnummer).astype('Int64')),
+        opleiding=lambda df: _as_text(df.opleiding),
+        processtap=lambda df: _as_text(df.processtap),
+        antwoord=lambda df: _as_text(df.antwoord),
     )
 
-    query = "processtap.str.contains('O_DATUM') and antwoord in @data"
-    if studentnummers is not None:
-        query += ' and studentnummer in @studentnummers'
-    forms = df.query(query).ooa_id.unique()
-    return df.loc[lambda df: df.ooa_id.isin(forms)]
+
+def importeer_export(path, collegejaar, store=STORE, chunksize=100_000):
+    """
+    Import raw OOA export (xlsx or csv) into a parquet store, one dataset
+    per collegejaar. The export is read in chunks of `chunksize` rows; only
+    the columns used by the pipeline are kept and the answer columns are
+    coalesced into `antwoord` once. Ids are stored as integers, all other
+    columns as text. The dataset is written to a hidden sibling directory
+    and only replaces the existing dataset once the whole export has been
+    read, so a failed import leaves the previous dataset intact.
+
+    Parameters
+    ==========
+    :param path: {str or Path}
+        Location of the raw export.
+    :param collegejaar: str
+        Collegejaar of the export, e.g. '2022-2023'.
+    :param store: {str or Path}
+        Root of the parquet store.
+    :param chunksize: int
+        Number of rows read and written at a time.
+
+    Returns
+    =======
+    location of the dataset, to be read with `lees_export`
+        Path
+    """
+    dataset = Path(store) / f"collegejaar={collegejaar}"
+    dataset.parent.mkdir(parents=True, exist_ok=True)
+    # hidden names are skipped when the store is read as a dataset
+    tmp = Path(tempfile.mkdtemp(prefix=f".{dataset.name}.", dir=store))
+    old = tmp.with_suffix('.old')
+    try:
+        for i, chunk in enumerate(_lees_chunks(path, chunksize)):
+            chunk = _normaliseer_chunk(chunk).sort_values(
+                ['opleiding', 'ooa_id'], kind='stable')
+            chunk.to_parquet(tmp / f"part-{i:05d}.parquet", index=False)
+        if dataset.exists():
+            os.replace(dataset, old)
+        os.replace(tmp, dataset)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.rmtree(old, ignore_errors=True)
+    return dataset
+
+
+def fingerprint(df):
+    """
+    Return hash of the contents of `df` (columns and values, not the index).
+
+    Parameters
+    ==========
+    :param df: pd.DataFrame
+
+    Returns
+    =======
+    hexdigest
+        str
+    """
+    digest = hashlib.sha1(repr(list(df.columns)).encode())
+    digest.update(
+        pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='python -m report.data',
+        description="Importeer OOA export (xlsx of csv) in de parquet store.")
+    parser.add_argument('export', help="pad naar export")
+    parser.add_argument('collegejaar', help="bijv. 2022-2023")
+    parser.add_argument('--store', default=STORE)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    dataset = importeer_export(
+        args.export, args.collegejaar, args.store, args.chunksize)
+    print(dataset)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import datetime
+import os
+import threading
+from functools import cache
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from report.specs import build_jsondata
+
+
+TEMPLATES = "templates"
+BYTECODE_CACHE = "data/.cache/jinja"
+
+
+@cache
+def environment(path=TEMPLATES, bytecode_cache=BYTECODE_CACHE):
+    """
+    Retourneer gedeelde Jinja-omgeving voor `path`. Gecompileerde templates
+    worden per proces hergebruikt en als bytecode in `bytecode_cache`
+    bewaard, zodat ook nieuwe processen niet opnieuw hoeven te compileren.
+    """
+    if bytecode_cache is not None:
+        Path(bytecode_cache).mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache)
+    return Environment(
+        loader=FileSystemLoader(path),
+        bytecode_cache=bytecode_cache,
+    )
+
+
+def _context(
+    sections,
+    taal,
+    opleiding,
+    werkgroep=None,
+    collegejaar=None,
+    matchingsdata=None,
+    nformulier=None,
+):
+    matchingsdata = (
+        [matchingsdata] if isinstance(matchingsdata, str) else matchingsdata)
+    specs, datasets = build_jsondata(sections)
+    return dict(
+        sections=sections,
+        specs=specs,
+        datasets=datasets,
+        taal=taal,
+        opleiding=opleiding,
+        werkgroep=werkgroep,
+        collegejaar=collegejaar,
+        datum=datetime.date.today().isoformat(),
+        matchingsdata=', '.join(matchingsdata or []),
+        nformulier=nformulier,
+    )
+
+
+def render_report(sections, taal, opleiding, template='template.jinja', **kwargs):
+    """
+    Render rapportage uit door `transform_specs` opgebouwde `sections` als
+    html.
+    """
+    context = _context(sections, taal, opleiding, **kwargs)
+    return environment().get_template(template).render(**context)
+
+
+def stream_report(
+    path,
+    sections,
+    taal,
+    opleiding,
+    template='template.jinja',
+    **kwargs,
+):
+    """
+    Render rapportage zoals `render_report`, maar schrijf de html in delen
+    naar `path` in plaats van het hele document in het geheugen op te
+    bouwen. Alleen de html wordt gestreamd: de specs en datasets van de
+    grafieken (zie `build_jsondata`) worden vooraf in hun geheel opgebouwd,
+    net als de `sections` zelf. De html wordt eerst naar een tijdelijk
+    bestand geschreven, zodat `path` nooit een halve rapportage bevat.
+    """
+    path = Path(path)
+    context = _context(sections, taal, opleiding, **kwargs)
+    stream = environment().get_template(template).stream(**context)
+    stream.enable_buffering(64)
+    tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        stream.dump(str(tmp), encoding='utf8')
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return path
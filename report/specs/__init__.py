@@ -1,40 +1,189 @@
+import json
+import traceback
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
+import report.core.getters as getters
+from report.cache import chart_id
+from report.core import backend
+from report.core.chart import Chart
+from report.data import fingerprint
+from report.trace import NULL
 
-def transform_specs(specs, data, taal):
+
+def transform_specs(specs, data, taal, cache=None, trace=None, executor=None):
+    """
+    Bouw grafieken en tabellen uit `specs` voor `data` in `taal`. Grafieken
+    krijgen een deterministisch id (zie `chart_id`); met een `ChartCache`
+    worden eerder gerenderde grafieken voor dezelfde data hergebruikt. Met
+    een `Trace` worden tijd, geheugen en omvang per sectie en item gemeten.
+
+    Met een `executor` (thread pool, of process pool uit `process_pool`)
+    worden alle items gelijktijdig gebouwd. Secties en items houden hun
+    volgorde; een item dat faalt wordt weggelaten en met foutmelding in
+    `fouten` van de sectie opgenomen. Bij een process pool wordt `trace` niet
+    gebruikt.
+    """
+    trace = NULL if trace is None else trace
+    fp = fingerprint(data)
+    if executor is not None:
+        return _transform_concurrent(
+            specs, data, taal, fp, cache, trace, executor)
     sections = {}
     for key, spec in specs.items():
-        section = {}
-        section['titel'] = spec['titel'][taal]
-        items = []
-        for item in spec['items']:
-            if item['type'] == 'chart':
+        with trace.span(key, 'section', section=key):
+            items = [
+                build_item(key, item, data, taal, fp, cache, trace)
+                for item in spec['items']
+            ]
+        sections[key] = {
+            'titel': spec['titel'][taal],
+            'items_': [item for item in items if item is not None],
+        }
+    return sections
+
+
+_data = None
+
+
+def _init_items(data, fp, paths, preaggregate, backend_):
+    global _data
+    _data = data, fp
+    getters.configure(**paths)
+    backend.configure(backend_)
+    Chart.preaggregate = preaggregate
+
+
+def _build_item(key, item, taal, fp, cache=None):
+    data, worker_fp = _data
+    if worker_fp != fp:
+        raise ValueError("process pool is voor andere formulieren gemaakt")
+    return build_item(key, item, data, taal, fp, cache)
+
+
+def process_pool(data, max_workers=None, mp_context=None):
+    """
+    Retourneer process pool voor `transform_specs` met formulieren `data`.
+    `data` en de configuratie (paden van PDEF, codings en cache, backend en
+    `Chart.preaggregate`) gaan eenmalig per worker mee bij het starten, in
+    plaats van met elk item; zo werkt de pool ook met spawn (Windows).
+    """
+    fp = fingerprint(data)
+    pool = ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=mp_context,
+        initializer=_init_items,
+        initargs=(
+            data, fp, dict(getters.PATHS), Chart.preaggregate,
+            backend.BACKEND),
+    )
+    pool.fingerprint = fp
+    return pool
+
+
+def _transform_concurrent(specs, data, taal, fp, cache, trace, executor):
+    if isinstance(executor, ProcessPoolExecutor):
+        if getattr(executor, 'fingerprint', None) != fp:
+            raise ValueError(
+                "gebruik een process pool uit `process_pool(data)`")
+        submit = lambda key, item: executor.submit(
+            _build_item, key, item, taal, fp, cache)
+    else:
+        submit = lambda key, item: executor.submit(
+            build_item, key, item, data, taal, fp, cache, trace)
+    futures = {
+        key: [submit(key, item) for item in spec['items']]
+        for key, spec in specs.items()
+    }
+    sections = {}
+    for key, spec in specs.items():
+        items, fouten = [], []
+        for item, future in zip(spec['items'], futures[key]):
+            try:
+                result = future.result()
+            except Exception as e:
+                fouten.append({
+                    'item': item['item'].__name__,
+                    'error': f"{type(e).__name__}: {e}",
+                    'traceback': ''.join(traceback.format_exception(e)),
+                })
+                continue
+            if result is not None:
+                items.append(result)
+        sections[key] = {
+            'titel': spec['titel'][taal],
+            'items_': items,
+            'fouten': fouten,
+        }
+    return sections
+
+
+def build_item(key, item, data, taal, fp, cache=None, trace=NULL):
+    """
+    Bouw `item` uit sectie `key` en retourneer het item aangevuld met titel
+    en output (en uuid voor grafieken), of `None` als er geen data is.
+    """
+    item = dict(item)
+    name = item['item'].__name__
+    span = lambda step: trace.span(step, 'step', section=key, item=name)
+    with trace.span(name, 'item', section=key, item=name) as t:
+        if item['type'] == 'chart':
+            with span('build'):
                 obj = build_chart(item, data, taal)
-                output = obj.chart()
-                if output is None:
-                    continue
-                item['uuid'] = obj.spec.uuid
-                item['titel'] = obj.spec.titel
-                item['output'] = output.to_json(indent=None)
-            if item['type'] == 'table':
+            obj.spec.uuid = chart_id(obj, item, taal, fp)
+            output = None if cache is None else cache.get(obj.spec.uuid)
+            if output is None:
+                with span('table'):
+                    obj.source.table
+                with span('chart'):
+                    chart = obj.chart()
+                with span('to_json') as s:
+                    output = (
+                        '' if chart is None else chart.to_json(indent=None))
+                    s['bytes'] = len(output)
+                if cache is not None:
+                    cache.put(obj.spec.uuid, output)
+            t['bytes'] = len(output)
+            if not output:
+                return None
+            item['uuid'] = obj.spec.uuid
+            item['titel'] = obj.spec.titel
+            item['output'] = output
+        if item['type'] == 'table':
+            with span('table'):
                 tablespec, df = item['item'](data, taal)
-                if df.empty:
-                    continue
+            if df.empty:
+                return None
+            with span('to_html') as s:
                 item['output'] = df.to_html()
-                item['titel'] = tablespec.titel
-            items.append(item)
-        section['items_'] = items
-        sections[key] = section
-    return sections
+                s['bytes'] = t['bytes'] = len(item['output'])
+            item['titel'] = tablespec.titel
+    return item
 
 
 def build_jsondata(sections):
-    return {
-        i['uuid']:i['output']
-        for section in sections.values()
-        for i in section['items_']
-        if i['type'] == 'chart'
-    }
+    """
+    Retourneer specs van alle grafieken in `sections` per uuid, met de data
+    losgemaakt in een gedeeld register. Altair benoemt datasets naar een hash
+    van de inhoud, zodat grafieken met dezelfde data naar dezelfde dataset
+    verwijzen; elke spec krijgt de namen van de datasets die deze gebruikt.
+
+    Retourneert (specs, datasets): specs als uuid -> (json, namen) en
+    datasets als naam -> json.
+    """
+    specs, datasets = {}, {}
+    for section in sections.values():
+        for i in section['items_']:
+            if i['type'] != 'chart':
+                continue
+            spec = json.loads(i['output'])
+            names = []
+            for name, values in spec.pop('datasets', {}).items():
+                if name not in datasets:
+                    datasets[name] = json.dumps(values)
+                names.append(name)
+            specs[i['uuid']] = json.dumps(spec), names
+    return specs, datasets
 
 
 def build_chart(spec, data, taal):
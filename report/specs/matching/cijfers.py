@@ -1,10 +1,11 @@
-from functools import cached_property
-
 import altair as alt
+import numpy as np
 import pandas as pd
 
+from report.core import backend
 from report.core.spec import Spec
-from report.core.source import Source
+from report.core.predicate import col
+from report.core.source import Source, shared_property
 from report.core.chart import Chart
 from report.charts.api import ChartBar
 
@@ -22,25 +23,60 @@ class VWO:
 
 
 class SourceCijfers(Source):
-    query = "ooa_id in @ooa_ids and processtap in @self.spec.vragen"
-
     @property
+    def query(self):
+        """Formulieren met een van de antwoorden `dip` op `vraag`."""
+        diploma = (
+            (col('processtap') == self.vraag)
+            & col('antwoord').isin(self.dip)
+        )
+        return diploma.per()
+
+    @shared_property
     def _base(self):
-        ooa_ids = self.data.query(
-            "processtap == @self.vraag and antwoord in @self.dip"
-        ).ooa_id
-        base = self.data.query(self.query)
-        return self._transform(base)
+        if backend.is_polars():
+            base = backend.take(
+                self.data, self.processtappen, (self.vraag, self.dip))
+            return self._transform(base)
+        return super()._base
 
     def _transform(self, data):
         return super()._transform(data).assign(
-            antwoord = lambda df: df.antwoord.map(self.validate_grades).round()
+            antwoord = lambda df: self.parse_grades(df.antwoord)
         )
 
-    @cached_property
+    @shared_property
     def table(self):
+        if backend.is_pushdown():
+            table = backend.grades(
+                self.data, self.processtappen, (self.vraag, self.dip))
+            # via map, zodat een lege tabel een object-kolom houdt
+            vragen = self.spec.vragen
+            return table.assign(
+                processtap=table.processtap.map(lambda i: vragen[i]))
         return self._base[['processtap', 'antwoord']].reset_index(drop=True)
 
+    @staticmethod
+    def parse_grades(s):
+        """
+        Return series of grades as rounded numbers, NaN if conversion fails.
+        Vectorized version of `validate_grades`; also accepts a comma as
+        decimal separator.
+        - Numbers larger than 100 are discarded.
+        - Numbers between 10 and 100 are normalized to 1-10 range.
+        - Numbers lower than a 4 are discarded.
+        """
+        x = pd.to_numeric(
+            s.astype(str).str.replace(',', '.', regex=False),
+            errors='coerce',
+        ).to_numpy(dtype=float)
+        grades = np.select(
+            [x > 100, x > 10, x < 4],
+            [np.nan, x / 10, np.nan],
+            default=x,
+        )
+        return pd.Series(grades.round(), index=s.index, name=s.name)
+
     @staticmethod
     def validate_grades(x):
         """
@@ -68,6 +104,17 @@ class SourceCijfersVWO(SourceCijfers, VWO):
 
 
 class ChartCijfers(Chart):
+    """
+    Histogram van cijfers per vraag met gemiddelde als rode lijn.
+    Met `preaggregate` worden bins, aantallen, totalen, percentages en
+    gemiddelden in pandas berekend en alleen de geaggregeerde rijen in de
+    spec opgenomen, in plaats van alle losse cijfers.
+    """
+
+    @property
+    def _aantal(self):
+        return 'sum(aantal):Q' if self.preaggregate else 'count():Q'
+
     def _transform(self, base):
         return base.transform_joinaggregate(
             totaal='count()',
@@ -86,13 +133,57 @@ class ChartCijfers(Chart):
             pct = 'datum.bincount / datum.totaal'
         )
 
+    def _aggregate(self, source):
+        return self.bin_grades(source)
+
+    @staticmethod
+    def bin_grades(table, extent=(4, 10), step=1):
+        """
+        Retourneer aantal per processtap, bin en cijfer met totaal, gemiddelde
+        en percentage, zoals de transforms in `_transform` deze berekenen.
+        Net als in vega krijgen cijfers buiten `extent` een bin van -/+
+        oneindig (in de spec leeg, dus zonder staaf) en valt `stop` zelf in
+        de laatste bin; ongeldige cijfers tellen mee in het totaal.
+        """
+        start, stop = extent
+        grades = table.antwoord.astype(float)
+        binned = start + step * np.floor(
+            1e-14 + (grades.clip(start, stop - step) - start) / step)
+        buiten = np.select(
+            [grades < start, grades > stop], [-np.inf, np.inf], np.nan)
+        df = table.assign(
+            antwoord=grades,
+            binned=binned.where(np.isnan(buiten), buiten),
+            binned_end=(binned + step).where(np.isnan(buiten), buiten),
+        )
+        by_vraag = df.groupby('processtap', sort=False).antwoord
+        by_bin = df.groupby(
+            ['processtap', 'binned_end'], dropna=False, sort=False).antwoord
+        return (
+            df
+            .assign(
+                totaal=by_vraag.transform('size'),
+                mean=by_vraag.transform('mean'),
+                pct=lambda df: by_bin.transform('size') / df.totaal,
+            )
+            .groupby(
+                ['processtap', 'antwoord', 'binned', 'binned_end',
+                 'totaal', 'mean', 'pct'],
+                dropna=False,
+                sort=False,
+            )
+            .size()
+            .rename('aantal')
+            .reset_index()
+        )
+
     @property
     def _tooltip(self):
         return [
             alt.Tooltip('processtap:N', title=self.spec.labels['vraag']),
             alt.Tooltip('antwoord:N', title=self.spec.labels['antwoord']),
             alt.Tooltip('totaal:Q', title=self.spec.labels['totaal']),
-            alt.Tooltip('count():Q', title=self.spec.labels['aantal']),
+            alt.Tooltip(self._aantal, title=self.spec.labels['aantal']),
             alt.Tooltip('pct:Q', title=self.spec.labels['pct'], format='.0%'),
         ]
 
@@ -101,7 +192,7 @@ class ChartCijfers(Chart):
         bar = base.mark_bar().encode(
             x=alt.X('binned:Q', title='cijfer', axis=alt.Axis(tickMinStep=1)),
             x2='binned_end:Q',
-            y=alt.Y('count():Q', title='aantal', axis=alt.Axis(tickMinStep=1)),
+            y=alt.Y(self._aantal, title='aantal', axis=alt.Axis(tickMinStep=1)),
             tooltip=self._tooltip
         )
         rule = base.mark_rule(color='red', strokeDash=[15,5]).encode(
@@ -122,77 +213,26 @@ class ChartCijfers(Chart):
             ).resolve_axis(x='independent')
 
 
-def GrafiekHAVO(data, taal, **props):
-    query = (
-        "processtap.str.contains('[OU]_CIJF_(?!TOEL.*$).*')"
-    )
-    antw = Map({
-        4:  '4',
-        5:  '5',
-        6:  '6',
-        7:  '7',
-        8:  '8',
-        9:  '9',
-        10: '10',
-    })
-    spec = Spec(
-        vragen = VraagItemsQueryFromPDEF(query, taal),
-        titel = TitelFromPDEF('U_CIJF_TOEL3', taal),
-        antw = antw,
-        taal = taal,
-    )
-    source = SourceCijfersHAVO(data, spec)
-    return ChartCijfers(source, spec, **props)
+CIJFERS = col('processtap').contains('[OU]_CIJF_(?!TOEL.*$).*')
+ANTW = Map({i: str(i) for i in range(4, 11)})
 
 
-def GrafiekVWO(data, taal, **props):
-    query = (
-        "processtap.str.contains('[OU]_CIJF_(?!TOEL.*$).*')"
-    )
-    antw = Map({
-        4:  '4',
-        5:  '5',
-        6:  '6',
-        7:  '7',
-        8:  '8',
-        9:  '9',
-        10: '10',
-    })
-    spec = Spec(
-        vragen = VraagItemsQueryFromPDEF(query, taal),
-        titel = TitelFromPDEF('O_CIJF_TOEL4', taal),
-        antw = antw,
+def cijfer_spec(taal, titel):
+    return Spec(
+        vragen = VraagItemsQueryFromPDEF(CIJFERS, taal),
+        titel = titel,
+        antw = ANTW,
         taal = taal,
     )
-    source = SourceCijfersVWO(data, spec)
-    return ChartCijfers(source, spec, **props)
 
 
-def TabelHAVO(data, taal, **props):
-    query = (
-        "processtap.str.contains('[OU]_CIJF_(?!TOEL.*$).*')"
-    )
-    antw = Map({
-        4:  '4',
-        5:  '5',
-        6:  '6',
-        7:  '7',
-        8:  '8',
-        9:  '9',
-        10: '10',
-    })
-    spec = Spec(
-        vragen = VraagItemsQueryFromPDEF(query, taal),
-        titel = {
-            'nl': 'Overzicht havo-cijfers',
-            'en': 'Overview havo-grades'
-        }[taal],
-        antw = antw,
-        taal = taal,
-    )
-    source = SourceCijfersHAVO(data, spec)
-    return spec, (
-        source._base
+def cijfer_tabel(source, spec):
+    """
+    Retourneer aantal, gemiddelde, minimum en maximum per vraag uit de
+    (gedeelde) cijfertabel van `source`.
+    """
+    return (
+        source.table
         .groupby('processtap')
         .antwoord
         .agg(['count', 'mean', 'min', 'max'])
@@ -206,39 +246,33 @@ def TabelHAVO(data, taal, **props):
     )
 
 
+def GrafiekHAVO(data, taal, **props):
+    spec = cijfer_spec(taal, TitelFromPDEF('U_CIJF_TOEL3', taal))
+    source = SourceCijfersHAVO.of(data, spec)
+    return ChartCijfers(source, spec, **props)
+
+
+def GrafiekVWO(data, taal, **props):
+    spec = cijfer_spec(taal, TitelFromPDEF('O_CIJF_TOEL4', taal))
+    source = SourceCijfersVWO.of(data, spec)
+    return ChartCijfers(source, spec, **props)
+
+
+def TabelHAVO(data, taal, **props):
+    titel = {
+        'nl': 'Overzicht havo-cijfers',
+        'en': 'Overview havo-grades'
+    }[taal]
+    spec = cijfer_spec(taal, titel)
+    source = SourceCijfersHAVO.of(data, spec)
+    return spec, cijfer_tabel(source, spec)
+
+
 def TabelVWO(data, taal, **props):
-    query = (
-        "processtap.str.contains('[OU]_CIJF_(?!TOEL.*$).*')"
-    )
-    antw = Map({
-        4:  '4',
-        5:  '5',
-        6:  '6',
-        7:  '7',
-        8:  '8',
-        9:  '9',
-        10: '10',
-    })
-    spec = Spec(
-        vragen = VraagItemsQueryFromPDEF(query, taal),
-        titel = {
-            'nl': 'Overzicht vwo-cijfers',
-            'en': 'Overview vwo-grades'
-        }[taal],
-        antw = antw,
-        taal = taal,
-    )
-    source = SourceCijfersVWO(data, spec)
-    return spec, (
-        source._base
-        .groupby('processtap')
-        .antwoord
-        .agg(['count', 'mean', 'min', 'max'])
-        .assign(mean = lambda df: df['mean'].round(1))
-        .dropna()
-        .astype({'min': int, 'max': int})
-        .rename_axis(index=None, columns=spec.labels['vraag'])
-        .rename(
-            columns={'count': 'n', 'mean': spec.labels['gemiddelde']},
-            index=spec.vragen)
-    )
+    titel = {
+        'nl': 'Overzicht vwo-cijfers',
+        'en': 'Overview vwo-grades'
+    }[taal]
+    spec = cijfer_spec(taal, titel)
+    source = SourceCijfersVWO.of(data, spec)
+    return spec, cijfer_tabel(source, spec)
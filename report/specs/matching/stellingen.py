@@ -3,6 +3,7 @@ from functools import cache, cached_property
 import altair as alt
 import pandas as pd
 
+from report.core.predicate import col
 from report.core.spec import Spec
 from report.core.source import Source
 from report.charts.api import ChartBarNormStack, ChartBarOrdinal
@@ -30,8 +31,8 @@ def StellingEens(data, taal, **props):
     stype = 'AANM_5PUNTS'
     antw = 'STELLING_EENS'
     query = (
-        "processtap.str.contains('O_STELLING')"
-        f"and systeemlijst_io == '{stype}'"
+        col('processtap').contains('O_STELLING')
+        & (col('systeemlijst_io') == stype)
     )
 
     spec = Spec(
@@ -49,8 +50,8 @@ def StellingPast(data, taal, **props):
     stype = 'AANM_5PUNTS_B'
     antw = 'STELLING_PAST'
     query = (
-        "processtap.str.contains('O_STELLING')"
-        f"and systeemlijst_io == '{stype}'"
+        col('processtap').contains('O_STELLING')
+        & (col('systeemlijst_io') == stype)
     )
 
     spec = Spec(
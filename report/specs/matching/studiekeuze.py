@@ -1,32 +1,46 @@
-from functools import cached_property
-
+from report.core import backend
 from report.core.spec import Spec
-from report.core.source import Source
+from report.core.source import Source, shared_property
 from report.core.getters import Map
+from report.core.multiselect import MultiSelect
 from report.charts.api import ChartBarNormStack, ChartPie
 
 
-class SourceFactoren(Source):
-    query = "processtap == 'U_FACTOREN'"
+class SourceMultiSelect(Source):
+    """
+    Bron voor meerkeuzevragen waarvan de antwoorden met '|' gescheiden in een
+    enkele processtap staan. Telt per optie hoeveel studenten deze wel en niet
+    kozen.
+    """
+    @property
+    def matrix(self):
+        return MultiSelect.of(self.data, self.processtappen[0])
 
-    @cached_property
+    @shared_property
     def table(self):
+        if backend.is_pushdown():
+            counts, n = backend.multiselect(self.data, self.processtappen[0])
+        else:
+            counts, n = self.matrix.counts(), len(self.matrix.students)
+        if counts.empty:
+            return None
         return (
-            self._base
-            .assign(antwoord = lambda df: df.antwoord.str.split('|'))
-            .explode('antwoord')
-            .antwoord.value_counts()
+            counts
+            .sort_values(ascending=False)
             .rename_axis('processtap')
             .rename('ja')
             .to_frame()
-            .assign(
-                nee = lambda df: self._base.studentnummer.nunique() - df.ja)
+            .assign(nee = lambda df: n - df.ja)
             .rename(
                 index=self.spec.vragen,
                 columns=self.spec.labels)
         )
 
 
+class SourceFactoren(SourceMultiSelect):
+    processtappen = ['U_FACTOREN']
+
+
 def StudiekeuzeMiddel(data, taal, **props):
     labels={'vraag': {'nl': 'middel', 'en': 'tool/activity'}}
     spec = Spec.from_spec('U_ACTIV_MIDDEL', taal=taal, labels=labels)
@@ -66,33 +80,14 @@ def TrackTLWB(data, taal, **props):
     return ChartPie(source, spec, **props)
 
 
-class SourceBeroep(Source):
-    query = "processtap == 'O_BEROEP'"
-
-    @property
-    def table(self):
-        if self._base.empty:
-            return None
-        return (
-            self._base
-            .assign(antwoord = lambda df: df.antwoord.str.split('|'))
-            .explode('antwoord')
-            .antwoord.value_counts()
-            .rename_axis('processtap')
-            .rename('ja')
-            .to_frame()
-            .assign(
-                nee = lambda df: self._base.studentnummer.nunique() - df.ja)
-            .rename(
-                index=self.spec.vragen,
-                columns=self.spec.labels)
-        )
+class SourceBeroep(SourceMultiSelect):
+    processtappen = ['O_BEROEP']
 
 
 def OverigBeroep(data, taal, **props):
     labels={'vraag': {'nl': 'beroep', 'en': 'profession'}}
     spec = Spec.from_pdef('O_BEROEP', taal=taal, labels=labels)
     spec.vragen = spec.antw
-    spec.antw = Map({'ja': 'ja', 'nee': 'nee'})
+    spec.antw = Map({'ja': spec.labels['ja'], 'nee': spec.labels['nee']})
     source = SourceBeroep(data, spec)
     return ChartBarNormStack(source, spec, **props)
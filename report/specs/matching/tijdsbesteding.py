@@ -1,33 +1,69 @@
-from functools import cached_property
-
 import pandas as pd
 
+from report.core import backend
 from report.core.spec import Spec
-from report.core.source import Source
+from report.core.source import Source, shared_property
 from report.charts.api import ChartBar
 
 from report.core.getters import Map, VraagItemsFromSPEC, TitelFromPDEF
 
 
 class SourceTijdsbesteding(Source):
-    @cached_property
+    breaks = [0, 5, 10, 15, 20, 25, 30, 100]
+
+    def _transform(self, data):
+        # vragen worden pas in `table` op het geaggregeerde resultaat vertaald
+        return data
+
+    @staticmethod
+    def parse_hours(s):
+        """
+        Return series of hours as numbers; comma is accepted as decimal
+        separator and invalid input becomes NaN.
+        """
+        return pd.to_numeric(
+            s.astype(str).str.replace(',', '.', regex=False),
+            errors='coerce',
+        )
+
+    @shared_property
     def table(self):
+        if backend.is_pushdown():
+            return self._table_backend()
         if self._base.empty:
             return None
-        breaks = [0, 5, 10, 15, 20, 25, 30, 100]
-        to_float = lambda i: float(i.replace(',', '.'))
         return (
             self._base
             .assign(
                 antwoord = lambda df: pd.cut(
-                    df.antwoord.apply(to_float),
-                    bins=breaks,
+                    self.parse_hours(df.antwoord),
+                    bins=self.breaks,
                     labels=self.spec.antw.values))
-            .replace({'processtap': self.spec.vragen})
             .pivot_table(
                 index = 'processtap',
                 columns = 'antwoord',
                 aggfunc = 'size')
+            .rename(index=self.spec.vragen)
+            .sort_index()
+        )
+
+    def _table_backend(self):
+        counts = backend.hours(self.data, self.processtappen, self.breaks)
+        if counts.empty:
+            return None
+        labels = self.spec.antw.values
+        klasse = counts.index.get_level_values('klasse')
+        return (
+            counts.reset_index()
+            .assign(antwoord = pd.Categorical.from_codes(
+                klasse, categories=labels, ordered=True))
+            .pivot_table(
+                index = 'processtap',
+                columns = 'antwoord',
+                values = 'n',
+                aggfunc = 'sum')
+            .rename(index=self.spec.vragen)
+            .sort_index()
         )
 
 
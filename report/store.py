@@ -0,0 +1,705 @@
+"""
+Lokale DuckDB-database met de formulieren van meerdere collegejaren en de
+bijbehorende PDEF en codings.
+
+    python -m report.store importeer EXPORT JAAR [--pdef X] [--codings X]
+    python -m report.store info
+
+Selecties (`Store.selecteer_forms_batch`) en de aantallen van een `Cube`
+(`Store.cube`) worden als SQL in de database uitgevoerd; alleen de
+geselecteerde formulieren en de aantallen worden in pandas geladen, hoeveel
+collegejaren er ook in de database staan. Met de duckdb-backend (zie
+`report.core.backend`) worden ook de tabellen van de bronnen als SQL
+uitgevoerd (`counts`, `hours`, `grades`, `multiselect`): op de database voor
+formulieren uit `Store.selecteer_forms_batch`, anders op het dataframe zelf.
+Een formulier wordt geïdentificeerd door collegejaar en `ooa_id`; de
+geselecteerde formulieren houden daarom hun collegejaar.
+"""
+import argparse
+import hashlib
+import itertools
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from report.core.backend import _codes
+from report.core.cube import Cube
+from report.core.getters import read_excel_cached
+from report.data import (
+    _lees_chunks,
+    _normaliseer_chunk,
+    fingerprint,
+    lees_export,
+    normaliseer_forms,
+)
+
+
+PATH = "data/ooa.duckdb"
+COLUMNS = ['ooa_id', 'studentnummer', 'opleiding', 'processtap', 'antwoord']
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forms (
+    collegejaar VARCHAR,
+    rij BIGINT,
+    ooa_id BIGINT,
+    studentnummer BIGINT,
+    opleiding VARCHAR,
+    processtap VARCHAR,
+    antwoord VARCHAR
+)
+"""
+JAAR = """
+SELECT * EXCLUDE (rij), rij AS _row FROM forms
+WHERE list_contains($collegejaren::VARCHAR[], collegejaar)
+"""
+
+_connections = {}
+
+
+def _lijst(value):
+    return [value] if not isinstance(value, list) else value
+
+
+def _connect(path, read_only):
+    # database in het geheugen, gedeeld door alle cursors, voor geselecteerde
+    # formulieren; ook als de database zelf alleen-lezen is
+    con = duckdb.connect()
+    path = path.replace("'", "''")
+    con.execute(
+        f"ATTACH '{path}' AS ooa" + (" (READ_ONLY)" if read_only else ""))
+    con.execute("USE ooa")
+    return con
+
+
+def _cursor(con):
+    cursor = con.cursor()
+    cursor.execute("USE ooa")
+    return cursor
+
+
+def _open(path):
+    if path not in _connections:
+        _connections[path] = _connect(path, read_only=True)
+    return _connections[path]
+
+
+def _selectie(relation, selectie):
+    """
+    Retourneer SQL en parameters voor de formulieren in `relation` van
+    `selectie` (matchingsdata, opleidingen[, studentnummers]), zoals
+    `report.data.selecteer_forms_batch`.
+    """
+    data, progs, *studentnummers = selectie
+    studentnummers = studentnummers[0] if studentnummers else None
+    params = {
+        'data': [str(i) for i in _lijst(data)],
+        'progs': _lijst(progs),
+    }
+    student = ''
+    if studentnummers is not None:
+        params['studentnummers'] = [int(i) for i in studentnummers]
+        student = (
+            "AND studentnummer IN "
+            "(SELECT unnest($studentnummers::BIGINT[]))")
+    sql = f"""
+    SELECT f.* FROM {relation} f
+    SEMI JOIN (
+        SELECT collegejaar, ooa_id FROM {relation}
+        WHERE list_contains($progs::VARCHAR[], opleiding)
+        AND contains(processtap, 'O_DATUM')
+        AND list_contains($data::VARCHAR[], antwoord)
+        {student}
+    ) USING (collegejaar, ooa_id)
+    WHERE list_contains($progs::VARCHAR[], opleiding)
+    """
+    return sql, params
+
+
+class Store:
+    """
+    DuckDB-database met formulieren (tabel `forms`) en metadata (`pdef_ps`,
+    `pdef_antw` en `codings`) per collegejaar. Open alleen-lezen om vanuit
+    meerdere processen tegelijk te lezen.
+    """
+    def __init__(self, path=PATH, read_only=False):
+        if not read_only:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(Path(path).resolve())
+        self.con = _connect(self.path, read_only=read_only)
+        if not read_only:
+            self.con.execute(SCHEMA)
+        _connections[self.path] = self.con
+
+    def close(self):
+        _connections.pop(self.path, None)
+        with _lock:
+            for key, (path, _) in list(_selecties.items()):
+                if path == self.path:
+                    del _selecties[key]
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def collegejaren(self):
+        rows = self.con.execute(
+            "SELECT collegejaar, count(*), count(DISTINCT ooa_id) FROM forms "
+            "GROUP BY collegejaar ORDER BY collegejaar"
+        ).fetchall()
+        return {cj: {'rijen': n, 'formulieren': m} for cj, n, m in rows}
+
+    def importeer_export(self, export, collegejaar, chunksize=100_000):
+        """
+        Importeer OOA export (dataframe of pad naar xlsx, csv, pickle of
+        parquet) als `collegejaar`; een eerdere import van dat collegejaar
+        wordt vervangen. Ruwe exports worden in delen van `chunksize` rijen
+        gelezen. Retourneert aantal rijen.
+        """
+        if isinstance(export, pd.DataFrame):
+            df = normaliseer_forms(export)
+        elif str(export).lower().endswith(('.xlsx', '.csv')):
+            df = None
+            chunks = _lees_chunks(export, chunksize)
+        else:
+            df = normaliseer_forms(lees_export(export))
+        if df is not None:
+            chunks = (
+                df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+        con = _cursor(self.con)
+        con.begin()
+        try:
+            con.execute(
+                "DELETE FROM forms WHERE collegejaar = ?", [collegejaar])
+            n = 0
+            for chunk in chunks:
+                chunk = _normaliseer_chunk(chunk)[COLUMNS].assign(
+                    collegejaar=collegejaar,
+                    rij=np.arange(n, n + len(chunk)),
+                )
+                con.register('chunk', chunk)
+                con.execute("INSERT INTO forms BY NAME SELECT * FROM chunk")
+                con.unregister('chunk')
+                n += len(chunk)
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+        return n
+
+    def _vervang(self, con, table, df, collegejaar):
+        con.register('df', df.assign(collegejaar=collegejaar))
+        bestaat = con.execute(
+            "SELECT count(*) FROM duckdb_tables() "
+            "WHERE database_name = 'ooa' AND table_name = ?",
+            [table]).fetchone()[0]
+        if not bestaat:
+            con.execute(f"CREATE TABLE {table} AS SELECT * FROM df")
+        else:
+            columns = {
+                row[0] for row in con.execute(f"DESCRIBE {table}").fetchall()}
+            for col, type_, *_ in con.execute("DESCRIBE df").fetchall():
+                if col not in columns:
+                    con.execute(
+                        f'ALTER TABLE {table} ADD COLUMN "{col}" {type_}')
+            con.execute(
+                f"DELETE FROM {table} WHERE collegejaar = ?", [collegejaar])
+            con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM df")
+        con.unregister('df')
+
+    def importeer_metadata(self, collegejaar, pdef=None, codings=None):
+        """
+        Importeer PDEF (sheets 'ps' en 'antw') en codings van `collegejaar`;
+        eerdere versies van dat collegejaar worden vervangen.
+        """
+        tables = {}
+        if pdef is not None:
+            tables['pdef_ps'] = read_excel_cached(pdef)
+            tables['pdef_antw'] = read_excel_cached(pdef, sheet_name='antw')
+        if codings is not None:
+            tables['codings'] = read_excel_cached(codings)
+        con = _cursor(self.con)
+        con.begin()
+        try:
+            for table, df in tables.items():
+                self._vervang(con, table, df, collegejaar)
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+
+    def _metadata(self, table, collegejaar):
+        return (
+            self.con.execute(
+                f"SELECT * FROM {table} WHERE collegejaar = ?", [collegejaar])
+            .df()
+            .drop(columns='collegejaar')
+        )
+
+    def pdef(self, collegejaar):
+        """
+        Retourneer PDEF van `collegejaar` zoals `getters.load_pdef`.
+        """
+        return {
+            sheet: df.set_index(df.columns[0])
+            for sheet, df in {
+                'ps': self._metadata('pdef_ps', collegejaar),
+                'antw': self._metadata('pdef_antw', collegejaar),
+            }.items()
+        }
+
+    def codings(self, collegejaar):
+        """
+        Retourneer codings van `collegejaar` zoals
+        `getters.load_specifications`.
+        """
+        return self._metadata('codings', collegejaar).set_index('code')
+
+    def exporteer_metadata(self, collegejaar, path):
+        """
+        Schrijf PDEF en codings van `collegejaar` als workbooks in map
+        `path`, om met `getters.configure` te gebruiken. De bestandsnaam
+        bevat een hash van de inhoud; een bestaand workbook wordt dus niet
+        herschreven. Retourneert pad per soort ('pdef', 'codings'), zonder
+        soorten die niet voor `collegejaar` zijn geïmporteerd.
+        """
+        sheets = {}
+        try:
+            pdef = self.pdef(collegejaar)
+            sheets['pdef'] = {
+                'ps': pdef['ps'].reset_index(),
+                'antw': pdef['antw'].reset_index(),
+            }
+        except duckdb.CatalogException:
+            pass
+        try:
+            sheets['codings'] = {
+                'codings': self.codings(collegejaar).reset_index()}
+        except duckdb.CatalogException:
+            pass
+        paths = {}
+        for soort, frames in sheets.items():
+            if all(df.empty for df in frames.values()):
+                continue
+            digest = hashlib.sha1(collegejaar.encode())
+            for df in frames.values():
+                digest.update(fingerprint(df).encode())
+            naam = f"{soort}.{collegejaar}.{digest.hexdigest()}.xlsx"
+            file = Path(path) / naam
+            if not file.exists():
+                file.parent.mkdir(parents=True, exist_ok=True)
+                tmp = file.with_suffix('.tmp.xlsx')
+                with pd.ExcelWriter(tmp) as writer:
+                    for sheet, df in frames.items():
+                        df.to_excel(writer, sheet_name=sheet, index=False)
+                tmp.replace(file)
+            paths[soort] = str(file)
+        return paths
+
+    def selecteer_forms_batch(self, selecties, collegejaar):
+        """
+        Retourneer formulieren per selectie zoals
+        `report.data.selecteer_forms_batch`, uit collegejaar (of lijst van
+        collegejaren) `collegejaar`. De formulieren onthouden hun selectie,
+        zodat de duckdb-backend tabellen in de database kan berekenen; een
+        kolom `collegejaar` onderscheidt formulieren uit verschillende jaren.
+        """
+        collegejaren = _lijst(collegejaar)
+        con = _cursor(self.con)
+        forms = {}
+        try:
+            for key, selectie in selecties.items():
+                sql, params = _selectie('jaar', selectie)
+                df = (
+                    con.execute(
+                        f"WITH jaar AS ({JAAR}) {sql} "
+                        "ORDER BY collegejaar, _row",
+                        {'collegejaren': collegejaren, **params})
+                    .df()
+                    .loc[:, [*COLUMNS, 'collegejaar']]
+                    .astype({'ooa_id': 'Int64', 'studentnummer': 'Int64'})
+                )
+                df.attrs['store'] = {
+                    'path': self.path,
+                    'collegejaren': collegejaren,
+                    'selectie': selectie,
+                    'fingerprint': fingerprint(df),
+                }
+                forms[key] = df
+        finally:
+            con.close()
+        return forms
+
+    def cube(self, collegejaar, progs, werkgroepen=None):
+        """
+        Retourneer `Cube` over de formulieren van opleidingen `progs` in
+        collegejaar (of lijst van collegejaren) `collegejaar`; de aantallen
+        worden in de database berekend.
+        """
+        werkgroepen = pd.DataFrame(
+            [
+                (werkgroep, int(studentnummer))
+                for werkgroep, studentnummers in (werkgroepen or {}).items()
+                for studentnummer in set(studentnummers)
+            ],
+            columns=['werkgroep', 'studentnummer'],
+        ).astype({'werkgroep': object, 'studentnummer': 'int64'})
+        con = _cursor(self.con)
+        try:
+            con.register('werkgroepen', werkgroepen)
+            counts = con.execute(
+                f"""
+                WITH jaar AS (
+                    {JAAR} AND list_contains($progs::VARCHAR[], opleiding)
+                ),
+                datum AS (
+                    SELECT
+                        collegejaar, ooa_id,
+                        string_agg(DISTINCT antwoord, $sep ORDER BY antwoord)
+                            FILTER (WHERE antwoord IS NOT NULL) AS datum
+                    FROM jaar
+                    WHERE contains(processtap, 'O_DATUM')
+                    GROUP BY collegejaar, ooa_id
+                ),
+                rijen AS (
+                    SELECT j.*, d.datum FROM jaar j
+                    LEFT JOIN datum d USING (collegejaar, ooa_id)
+                    WHERE j.antwoord IS NOT NULL
+                )
+                SELECT
+                    opleiding, NULL::VARCHAR AS werkgroep, datum,
+                    processtap, antwoord, count(*) AS n
+                FROM rijen
+                GROUP BY ALL
+                UNION ALL
+                SELECT
+                    opleiding, w.werkgroep::VARCHAR AS werkgroep, datum,
+                    processtap, antwoord, count(*) AS n
+                FROM rijen JOIN werkgroepen w USING (studentnummer)
+                GROUP BY ALL
+                """,
+                {
+                    'collegejaren': _lijst(collegejaar),
+                    'progs': _lijst(progs),
+                    'sep': Cube.SEP,
+                },
+            ).df()
+        finally:
+            con.close()
+        return Cube.from_counts(
+            counts.set_index(Cube.dims).n.astype(np.int64))
+
+
+_registry = {}
+
+
+def _text(s):
+    # via de (weinige) unieke waarden; veel sneller dan astype('string')
+    codes, uniques = pd.factorize(s)
+    text = np.array([str(i) for i in uniques] + [None], dtype=object)
+    return text[codes]
+
+
+def _frame(data):
+    """
+    Retourneer `data` met tekstkolommen en rijnummer `_row`, om met duckdb
+    te bevragen; wordt eenmalig per dataframe omgezet.
+    """
+    key = id(data)
+    if key not in _registry:
+        _registry[key] = pd.DataFrame({
+            '_row': np.arange(len(data)),
+            'collegejaar': (
+                _text(data.collegejaar) if 'collegejaar' in data.columns
+                else ''),
+            'ooa_id': pd.to_numeric(data.ooa_id, errors='coerce'),
+            'studentnummer': pd.to_numeric(
+                data.studentnummer, errors='coerce'),
+            'opleiding': _text(data.opleiding),
+            'processtap': _text(data.processtap),
+            'antwoord': _text(data.antwoord),
+        })
+        weakref.finalize(data, _registry.pop, key, None)
+    return _registry[key]
+
+
+_selecties = {}
+_verlopen = []
+_lock = threading.Lock()
+_namen = itertools.count()
+
+
+def _selectie_tabel(data, link):
+    """
+    Retourneer naam van tabel (in het geheugen) met de formulieren van
+    `data` uit de database; wordt eenmalig per dataframe opgebouwd en
+    verwijderd als het dataframe niet meer bestaat.
+    """
+    key = id(data)
+    with _lock:
+        con = _cursor(_open(link['path']))
+        try:
+            # niet in de finalizer zelf: die kan midden in een query lopen
+            while _verlopen:
+                path, name = _verlopen.pop()
+                if path == link['path']:
+                    con.execute(f"DROP TABLE IF EXISTS {name}")
+            if key not in _selecties:
+                name = f"memory.selectie{next(_namen)}"
+                sql, params = _selectie('jaar', link['selectie'])
+                con.execute(
+                    f"CREATE TABLE {name} AS WITH jaar AS ({JAAR}) {sql}",
+                    {'collegejaren': link['collegejaren'], **params})
+                _selecties[key] = link['path'], name
+                weakref.finalize(data, _verloop, key)
+        finally:
+            con.close()
+        return _selecties[key][1]
+
+
+def _verloop(key):
+    entry = _selecties.pop(key, None)
+    if entry is not None:
+        _verlopen.append(entry)
+
+
+_koppelingen = {}
+
+
+def _gekoppeld(data, link):
+    """
+    Is `data` ongewijzigd de selectie uit `Store.selecteer_forms_batch`?
+    pandas neemt `attrs` over in afgeleide dataframes, dus de vingerafdruk
+    wordt vergeleken; eenmalig per dataframe.
+    """
+    key = id(data)
+    if key not in _koppelingen:
+        _koppelingen[key] = fingerprint(data) == link['fingerprint']
+        weakref.finalize(data, _koppelingen.pop, key, None)
+    return _koppelingen[key]
+
+
+@contextmanager
+def _relatie(data):
+    """
+    Lever cursor en SQL (`WITH data AS (...)`) op voor de formulieren van
+    `data`: de selectie in de database als `data` uit
+    `Store.selecteer_forms_batch` komt, anders het dataframe zelf.
+    """
+    link = data.attrs.get('store')
+    if link is not None and _gekoppeld(data, link):
+        table = _selectie_tabel(data, link)
+        con = _cursor(_open(link['path']))
+        sql = f"WITH data AS (SELECT * FROM {table})"
+    else:
+        con = duckdb.connect()
+        con.register('frame', _frame(data))
+        sql = "WITH data AS (SELECT * FROM frame)"
+    try:
+        yield con, sql
+    finally:
+        con.close()
+
+
+def selecteer_forms_batch(df, selecties):
+    """
+    Duckdb-versie van `report.data.selecteer_forms_batch` voor een
+    genormaliseerde export.
+    """
+    forms = {}
+    with _relatie(df) as (con, with_):
+        for key, selectie in selecties.items():
+            sql, extra = _selectie('data', selectie)
+            rows = con.execute(
+                f"{with_} SELECT _row FROM ({sql}) ORDER BY _row",
+                extra).fetchnumpy()['_row']
+            forms[key] = df.iloc[rows]
+    return forms
+
+
+def counts(data, processtappen, codes=()):
+    """
+    Retourneer aantal antwoorden per processtap en antwoord, zoals
+    `report.core.backend.counts`.
+    """
+    with _relatie(data) as (con, with_):
+        df = con.execute(
+            f"""
+            {with_}
+            SELECT processtap, antwoord, count(*) AS n FROM data
+            WHERE list_contains($processtappen::VARCHAR[], processtap)
+            AND antwoord IS NOT NULL
+            GROUP BY processtap, antwoord
+            ORDER BY min(_row)
+            """,
+            {'processtappen': list(processtappen)},
+        ).df()
+    index = pd.MultiIndex.from_arrays(
+        [df.processtap.to_list(), _codes(df.antwoord, codes)],
+        names=['processtap', 'antwoord'])
+    return pd.Series(df.n.to_numpy(np.int64), index=index, name='n')
+
+
+def _getal(col):
+    return f"TRY_CAST(replace(trim({col}), ',', '.') AS DOUBLE)"
+
+
+def hours(data, processtappen, breaks):
+    """
+    Retourneer aantal antwoorden per processtap en klasse van uren, zoals
+    `report.core.backend.hours`.
+    """
+    klasse = ' '.join(
+        f"WHEN uren > {lo} AND uren <= {hi} THEN {i}"
+        for i, (lo, hi) in enumerate(zip(breaks[:-1], breaks[1:])))
+    with _relatie(data) as (con, with_):
+        df = con.execute(
+            f"""
+            {with_},
+            uren AS (
+                SELECT _row, processtap, {_getal('antwoord')} AS uren
+                FROM data
+                WHERE list_contains($processtappen::VARCHAR[], processtap)
+            ),
+            klassen AS (
+                SELECT _row, processtap, CASE {klasse} END AS klasse
+                FROM uren
+            )
+            SELECT processtap, klasse, count(*) AS n FROM klassen
+            WHERE klasse IS NOT NULL
+            GROUP BY processtap, klasse
+            ORDER BY min(_row)
+            """,
+            {'processtappen': list(processtappen)},
+        ).df()
+    index = pd.MultiIndex.from_arrays(
+        [df.processtap.to_list(), df.klasse.to_numpy(np.int64)],
+        names=['processtap', 'klasse'])
+    return pd.Series(df.n.to_numpy(np.int64), index=index, name='n')
+
+
+def grades(data, processtappen, diploma):
+    """
+    Retourneer processtap en cijfer per antwoord voor formulieren met
+    `diploma`, zoals `report.core.backend.grades`.
+    """
+    vraag, dip = diploma
+    with _relatie(data) as (con, with_):
+        df = con.execute(
+            f"""
+            {with_},
+            diploma AS (
+                SELECT DISTINCT collegejaar, ooa_id FROM data
+                WHERE processtap = $vraag
+                AND list_contains($dip::VARCHAR[], antwoord)
+            ),
+            cijfers AS (
+                SELECT _row, processtap, {_getal('antwoord')} AS x
+                FROM data SEMI JOIN diploma USING (collegejaar, ooa_id)
+                WHERE list_contains($processtappen::VARCHAR[], processtap)
+            )
+            SELECT
+                processtap,
+                round_even(CASE
+                    WHEN x > 100 THEN NULL
+                    WHEN x > 10 THEN x / 10
+                    WHEN x < 4 THEN NULL
+                    ELSE x
+                END, 0) AS antwoord
+            FROM cijfers
+            ORDER BY _row
+            """,
+            {
+                'processtappen': list(processtappen),
+                'vraag': vraag,
+                'dip': [str(i) for i in dip],
+            },
+        ).df()
+    return pd.DataFrame({
+        'processtap': pd.Series(df.processtap.to_list(), dtype=object),
+        'antwoord': df.antwoord.to_numpy(dtype=float),
+    })
+
+
+def multiselect(data, processtap, sep='|'):
+    """
+    Retourneer aantal studenten per optie en totaal aantal studenten, zoals
+    `report.core.backend.multiselect`.
+    """
+    with _relatie(data) as (con, with_):
+        params = {'processtap': processtap}
+        rijen = f"""
+            {with_},
+            rijen AS (
+                SELECT _row, studentnummer, antwoord FROM data
+                WHERE processtap = $processtap
+            )
+        """
+        options = con.execute(
+            f"""
+            {rijen},
+            opties AS (
+                SELECT
+                    _row, studentnummer,
+                    unnest(string_split(antwoord, $sep)) AS optie,
+                    unnest(range(len(string_split(antwoord, $sep)))) AS pos
+                FROM rijen
+                WHERE antwoord IS NOT NULL
+            )
+            SELECT optie, count(DISTINCT studentnummer) AS n FROM opties
+            GROUP BY optie
+            ORDER BY min([_row, pos])
+            """,
+            {**params, 'sep': sep},
+        ).df()
+        students = con.execute(
+            f"{rijen} SELECT count(DISTINCT studentnummer) FROM rijen",
+            params).fetchone()[0]
+    counts = pd.Series(
+        options.n.to_numpy(np.int64),
+        index=pd.Index(options.optie.to_list(), dtype=object))
+    return counts, students
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m report.store',
+        description="Beheer de DuckDB-database met OOA exports.")
+    parser.add_argument('--path', default=PATH, help="pad naar database")
+    sub = parser.add_subparsers(dest='command', required=True)
+    importeer = sub.add_parser(
+        'importeer', help="importeer export en metadata van een collegejaar")
+    importeer.add_argument('export', help="pad naar export")
+    importeer.add_argument('collegejaar', help="bijv. 2022-2023")
+    importeer.add_argument('--pdef')
+    importeer.add_argument('--codings')
+    importeer.add_argument('--chunksize', type=int, default=100_000)
+    sub.add_parser('info', help="toon geïmporteerde collegejaren")
+    args = parser.parse_args(argv)
+
+    with Store(args.path, read_only=args.command == 'info') as store:
+        if args.command == 'importeer':
+            n = store.importeer_export(
+                args.export, args.collegejaar, args.chunksize)
+            store.importeer_metadata(
+                args.collegejaar, args.pdef, args.codings)
+            print(f"{n:,} rijen -> {args.collegejaar} in {store.path}")
+        else:
+            for cj, info in store.collegejaren().items():
+                print(
+                    f"{cj:<12} {info['formulieren']:>10,} formulieren "
+                    f"{info['rijen']:>12,} rijen")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Instrumentatie van het opbouwen van rapportages: tijd, piekgeheugen en
+omvang van de output per sectie, item en stap.
+
+    trace = Trace()
+    sections = transform_specs(specs, data, taal, trace=trace)
+    trace.to_csv('trace.csv')
+    trace.to_chrome('trace.json')  # te openen in Perfetto of chrome://tracing
+
+Zonder trace wordt `NULL` gebruikt; een span kost dan alleen het betreden
+van een gedeelde lege context.
+"""
+import csv
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class Trace:
+    """
+    Verzamelt spans met starttijd, duur, piekgeheugen (tracemalloc, alleen
+    met `memory`) en aantal bytes output. Het piekgeheugen van een span is
+    het maximum boven het geheugengebruik bij het begin van de span,
+    inclusief geneste spans. Spans mogen vanuit meerdere threads gemaakt
+    worden; tracemalloc meet echter per proces, zodat het piekgeheugen van
+    gelijktijdige spans elkaar overlapt.
+    """
+    fields = ['cat', 'name', 'section', 'item', 'start', 'ms', 'peak', 'bytes']
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.events = []
+        self._local = threading.local()
+        self._t0 = time.perf_counter_ns()
+        self._started = False
+
+    @property
+    def _stack(self):
+        return self._local.__dict__.setdefault('stack', [])
+
+    def _memory(self):
+        if not self.memory:
+            return None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1]['_peak'] = max(self._stack[-1]['_peak'], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    @contextmanager
+    def span(self, name, cat, **args):
+        """
+        Meet het blok binnen de context als span `name` in categorie `cat`.
+        Levert een dict op waarin `bytes` gezet kan worden.
+        """
+        current = self._memory()
+        event = {
+            'cat': cat, 'name': name, **args, 'bytes': None,
+            'tid': threading.get_ident(), '_mem': current, '_peak': 0,
+        }
+        self._stack.append(event)
+        start = time.perf_counter_ns()
+        try:
+            yield event
+        finally:
+            end = time.perf_counter_ns()
+            self._stack.pop()
+            event['start'] = (start - self._t0) / 1e6
+            event['ms'] = (end - start) / 1e6
+            event['peak'] = None
+            if current is not None:
+                peak = tracemalloc.get_traced_memory()[1]
+                peak = max(event.pop('_peak'), peak)
+                event['peak'] = peak - event.pop('_mem')
+                if self._stack:
+                    self._stack[-1]['_peak'] = max(
+                        self._stack[-1]['_peak'], peak)
+            self.events.append(
+                {k: v for k, v in event.items() if not k.startswith('_')})
+
+    def close(self):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def to_csv(self, path):
+        """Schrijf spans in volgorde van start als csv."""
+        with open(path, 'w', newline='', encoding='utf8') as f:
+            writer = csv.DictWriter(
+                f, fieldnames=self.fields, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(sorted(self.events, key=lambda e: e['start']))
+
+    def to_chrome(self, path):
+        """Schrijf spans als Chrome trace events (json)."""
+        pid = os.getpid()
+        events = [
+            {
+                'name': e['name'],
+                'cat': e['cat'],
+                'ph': 'X',
+                'ts': e['start'] * 1e3,
+                'dur': e['ms'] * 1e3,
+                'pid': pid,
+                'tid': e['tid'],
+                'args': {
+                    k: v for k, v in e.items()
+                    if k not in ('name', 'cat', 'start', 'ms', 'tid')
+                },
+            }
+            for e in self.events
+        ]
+        with open(path, 'w', encoding='utf8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class NullTrace:
+    """Trace die niets meet."""
+
+    def span(self, name, cat, **args):
+        # eigen dict per span: aanroepers vullen deze met eigen velden
+        return nullcontext({})
+
+
+NULL = NullTrace()